@@ -0,0 +1,44 @@
+""" Measures how many Event rows per second boompy can turn from a query page into entities.
+
+    python benchmarks/decode_bench.py [pages]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import boompy
+
+from boompy.resource import ResourceList
+
+from fake_boomi import event_page
+
+class FakeResponse(object):
+    def __init__(self, content):
+        self.content = content
+
+    def close(self):
+        pass
+
+def bench_decode(pages):
+    content = event_page()
+    start = time.time()
+    rows = 0
+    for _ in range(pages):
+        rows += len(ResourceList.page_for_response(boompy.Event, FakeResponse(content)))
+    return rows / (time.time() - start)
+
+def bench_serialize(pages):
+    entities = list(list.__iter__(ResourceList.page_for_response(boompy.Event,
+                                                                 FakeResponse(event_page()))))
+    start = time.time()
+    for _ in range(pages):
+        for entity in entities:
+            entity.serialize()
+    return pages * len(entities) / (time.time() - start)
+
+if __name__ == "__main__":
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print("decode:    %10.0f rows/sec" % bench_decode(pages))
+    print("serialize: %10.0f rows/sec" % bench_serialize(pages))
@@ -0,0 +1,180 @@
+""" A local stand in for the boomi api, serving synthetic query, queryMore, get, bulk and update
+    responses so benchmarks measure boompy end to end over real http.
+
+    Each account id served has its own Scenario, which sets the latency, how many rows a query
+    returns, the share of requests answered with a 429, and the shape of the rows.
+"""
+import json
+import random
+import threading
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+# boompy stops paging at the first page with fewer rows than this.
+PAGE_SIZE = 100
+
+def event_row(i):
+    """ A wide Event row. """
+    return {
+        "@type": "Event", "eventId": "event-%s" % i, "accountId": "account-123456",
+        "atomId": "atom-%s" % (i % 7), "atomName": "Cloud Atom", "eventLevel": "ERROR",
+        "eventDate": "2016-03-%02dT10:%02d:%02dZ" % (i % 28 + 1, i % 60, i % 60),
+        "status": "COMPLETE_WARN", "eventType": "process.execution",
+        "executionId": "execution-%s" % i, "title": "Process failed", "startTime":
+        "2016-03-01T10:00:00Z", "endTime": "2016-03-01T10:01:00Z", "errorDocumentCount": i,
+        "inboundDocumentCount": i * 2, "outboundDocumentCount": i * 3, "processName": "Sync",
+        "recordDate": "2016-03-01T10:01:05Z", "error": "Something went wrong",
+        "environment": "Production", "classification": "PROD", "errorType": "DOCUMENT",
+        "erroredStepLabel": "Map", "erroredStepType": "map",
+    }
+
+def extensions_row(i, width=10):
+    """ An EnvironmentExtensions row with deeply nested connections and process properties. """
+    return {
+        "@type": "EnvironmentExtensions", "id": "extensions-%s" % i,
+        "extensionGroupId": "", "environmentId": "environment-%s" % i,
+        "connections": {"@type": "Connections", "connection": [{
+            "@type": "Connection", "id": "connection-%s" % c, "name": "Connection %s" % c,
+            "field": [{"@type": "Field", "id": "field-%s" % f, "value": "value-%s" % f,
+                       "useDefault": f % 2 == 0, "encryptedValueSet": False}
+                      for f in range(width)],
+        } for c in range(width)]},
+        "processProperties": {"@type": "OverrideProcessProperties", "ProcessProperty": [{
+            "@type": "OverrideProcessProperty", "id": "property-%s" % p, "name": "Property %s" % p,
+            "ProcessPropertyValue": [{"@type": "ProcessPropertyValue", "key": "key-%s" % v,
+                                      "label": "Label %s" % v, "value": "value-%s" % v}
+                                     for v in range(width)],
+        } for p in range(width)]},
+    }
+
+def environment_row(i):
+    return {"@type": "Environment", "id": "environment-%s" % i, "name": "Environment %s" % i,
+            "classification": "PROD" if i % 2 else "TEST"}
+
+SHAPES = {
+    "event": event_row,
+    "extensions": extensions_row,
+    "environment": environment_row,
+}
+
+def event_page(rows=PAGE_SIZE):
+    """ The body of a query page of wide Event rows. """
+    return json.dumps({"@type": "QueryResult", "result": [event_row(i) for i in range(rows)],
+                       "numberOfResults": rows})
+
+
+class Scenario(object):
+    """ How the fake server answers requests for one account id. `latency` is in seconds and
+        `throttle` is the share of requests answered with a 429. """
+
+    def __init__(self, shape="event", rows=1000, latency=0, throttle=0, seed=0):
+        self.shape = SHAPES[shape]
+        self.rows = rows
+        self.latency = latency
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pages = {}
+
+    def throttled(self):
+        with self.lock:
+            return self.random.random() < self.throttle
+
+    def page(self, offset):
+        """ The body of the query page starting at row `offset`. Pages are built once and reused
+            so the server isn't what is being measured. """
+        body = self.pages.get(offset)
+        if body is None:
+            end = min(offset + PAGE_SIZE, self.rows)
+            page = {"@type": "QueryResult", "numberOfResults": self.rows,
+                    "result": [self.shape(i) for i in range(offset, end)]}
+            if end < self.rows:
+                page["queryToken"] = "offset-%s" % end
+            body = self.pages[offset] = json.dumps(page)
+        return body
+
+
+class FakeBoomiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Send each response in one write, so Nagle's algorithm doesn't add 40ms to every request.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def route(self):
+        """ Returns the scenario and the path after the account id. """
+        path = self.path.split("?")[0].split("/rest/v1/", 1)[-1].split("/")
+        return self.server.scenarios[path[0]], path[1:]
+
+    def body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def respond(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).iteritems():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        scenario, path = self.route()
+        data = self.body()
+        if scenario.latency:
+            threading.Event().wait(scenario.latency)
+        if scenario.throttled():
+            return self.respond(429, "{}", {"Retry-After": "0"})
+
+        action = path[-1]
+        if method == "GET":
+            index = int(path[1].rsplit("-", 1)[-1])
+            return self.respond(200, json.dumps(scenario.shape(index)))
+        if action == "query":
+            return self.respond(200, scenario.page(0))
+        if action == "queryMore":
+            return self.respond(200, scenario.page(int(data.rsplit("-", 1)[-1])))
+        if action == "bulk":
+            ids = [item["id"] for item in json.loads(data)["request"]]
+            return self.respond(200, json.dumps({"@type": "BulkResult", "response": [
+                {"@type": "BulkResponse", "index": i, "id": boomi_id, "statusCode": 200,
+                 "Result": scenario.shape(int(boomi_id.rsplit("-", 1)[-1]))}
+                for i, boomi_id in enumerate(ids)]}))
+
+        # Creates and updates echo the entity back.
+        return self.respond(200, data)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+
+class FakeBoomi(ThreadingMixIn, HTTPServer):
+    """ Serves FakeBoomiHandler on a free local port from a background thread. """
+    daemon_threads = True
+    # The default backlog of 5 drops connections when many workers connect at once, and each drop
+    # costs a 1s SYN retransmit.
+    request_queue_size = 128
+
+    def __init__(self, scenarios):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), FakeBoomiHandler)
+        self.scenarios = scenarios
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:%s/api/rest/v1" % self.server_port
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
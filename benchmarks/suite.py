@@ -0,0 +1,213 @@
+""" End to end benchmarks of boompy against a local fake boomi server.
+
+    Each benchmark runs in its own process and reports rows/sec, the p50 and p99 latency of the
+    requests it made, and how much its peak memory grew. Every benchmark is run a few times and
+    the median of each number is kept. Results are compared against benchmarks/baselines.json; a
+    benchmark which got slower or bigger by more than the tolerance fails the run.
+
+    python benchmarks/suite.py                 # run and compare against the baselines
+    python benchmarks/suite.py --save          # run and store the results as the new baselines
+    python benchmarks/suite.py --only paging   # run the benchmarks whose name contains "paging"
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import boompy
+import boompy.base_api
+
+from boompy.rate_limit import RateLimiter
+
+from fake_boomi import FakeBoomi, Scenario
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_TOLERANCE = .3
+DEFAULT_REPEAT = 3
+
+# Absolute slack on top of the tolerance, so tiny numbers don't fail on noise.
+LATENCY_SLACK_MS = 10
+MEMORY_SLACK_KB = 2048
+
+class LatencySink(object):
+    """ Keeps every request latency so percentiles can be taken exactly. """
+
+    def __init__(self):
+        self.samples = []
+
+    def timing(self, name, seconds, tags):
+        if name == "request.latency":
+            self.samples.append(seconds)
+
+    def count(self, name, value, tags):
+        pass
+
+def percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[int(round(p * (len(ordered) - 1)))]
+
+def median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+def page_events():
+    return sum(1 for _ in boompy.Event.query())
+
+def prefetch_events():
+    return sum(1 for _ in boompy.Event.query().prefetch(depth=4))
+
+def event_records():
+    return sum(1 for _ in boompy.Event.query(records=True))
+
+def event_fields():
+    return sum(1 for _ in boompy.Event.query(fields=("eventId", "status")))
+
+def page_extensions():
+    return sum(1 for _ in boompy.EnvironmentExtensions.query())
+
+def bulk_get():
+    results = boompy.Environment.get_many(["environment-%s" % i for i in range(2000)])
+    results.raise_for_errors()
+    return len(results)
+
+def save_many():
+    environments = [boompy.Environment(id="environment-%s" % i, name="Renamed %s" % i)
+                    for i in range(500)]
+    results = boompy.Environment.save_many(environments)
+    results.raise_for_errors()
+    return len(results)
+
+def get_herd():
+    """ 50 threads getting the same 20 environments at once, as a fleet does on startup. """
+    boompy.enable_single_flight()
+    ids = ["environment-%s" % i for i in range(20)]
+
+    def work():
+        for boomi_id in ids:
+            boompy.Environment.get(boomi_id)
+
+    threads = [threading.Thread(target=work) for _ in range(50)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(threads) * len(ids)
+
+# name -> (scenario, function returning the number of rows it handled)
+BENCHMARKS = [
+    ("paging", Scenario("event", rows=10000, latency=.002), page_events),
+    ("paging_prefetch", Scenario("event", rows=10000, latency=.002), prefetch_events),
+    ("paging_records", Scenario("event", rows=10000, latency=.002), event_records),
+    ("paging_fields", Scenario("event", rows=10000, latency=.002), event_fields),
+    ("paging_throttled", Scenario("event", rows=5000, latency=.002, throttle=.1), page_events),
+    ("decode_deep", Scenario("extensions", rows=1000), page_extensions),
+    ("bulk_get", Scenario("environment", latency=.002), bulk_get),
+    ("save_many", Scenario("environment", latency=.002), save_many),
+    ("get_herd", Scenario("environment", latency=.02), get_herd),
+]
+
+def run_one(name, fn, base_url, conn):
+    """ Runs one benchmark in a child process and sends its results back over `conn`. """
+    boompy.base_api.BASE_URL = base_url
+    boompy.set_auth(name, "username", "password")
+    boompy.set_rate_limiter(RateLimiter(rate=100000))
+    session = boompy.API().session
+    session.mount("http://", session.get_adapter("https://api.boomi.com"))
+
+    sink = LatencySink()
+    boompy.enable_metrics(sink)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    rows = fn()
+    elapsed = time.time() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    conn.send({
+        "rows_per_sec": rows / elapsed,
+        "p50_ms": percentile(sink.samples, .5) * 1000,
+        "p99_ms": percentile(sink.samples, .99) * 1000,
+        "peak_kb": rss_after - rss_before,
+        "rows": rows,
+        "requests": len(sink.samples),
+    })
+    conn.close()
+
+def run(benchmarks, repeat=DEFAULT_REPEAT):
+    results = {}
+    with FakeBoomi(dict((name, scenario) for name, scenario, _ in benchmarks)) as server:
+        for name, _, fn in benchmarks:
+            runs = []
+            for _ in range(repeat):
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=run_one,
+                                                  args=(name, fn, server.base_url, child))
+                process.start()
+                runs.append(parent.recv())
+                process.join()
+            results[name] = dict((key, median([r[key] for r in runs])) for key in runs[0])
+    return results
+
+def regressions(name, result, baseline, tolerance):
+    """ Describes every way `result` is worse than `baseline` by more than the tolerance. """
+    failures = []
+    if result["rows_per_sec"] < baseline["rows_per_sec"] * (1 - tolerance):
+        failures.append("rows/sec %.0f < baseline %.0f" % (result["rows_per_sec"],
+                                                           baseline["rows_per_sec"]))
+    for key in ("p50_ms", "p99_ms"):
+        limit = max(baseline[key] * (1 + tolerance), baseline[key] + LATENCY_SLACK_MS)
+        if result[key] > limit:
+            failures.append("%s %.1f > baseline %.1f" % (key, result[key], baseline[key]))
+    if result["peak_kb"] > baseline["peak_kb"] * (1 + tolerance) + MEMORY_SLACK_KB:
+        failures.append("peak memory %dKB > baseline %dKB" % (result["peak_kb"],
+                                                              baseline["peak_kb"]))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--save", action="store_true", help="store the results as the baselines")
+    parser.add_argument("--only", help="only run benchmarks whose name contains this")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="how much worse than the baseline a result may be (default .3)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="runs of each benchmark to take the median of (default 3)")
+    args = parser.parse_args()
+
+    benchmarks = [b for b in BENCHMARKS if not args.only or args.only in b[0]]
+    results = run(benchmarks, args.repeat)
+
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+
+    failed = False
+    print("%-18s %12s %9s %9s %10s" % ("benchmark", "rows/sec", "p50 ms", "p99 ms", "peak KB"))
+    for name, _, _ in benchmarks:
+        result = results[name]
+        print("%-18s %12.0f %9.1f %9.1f %10d" % (name, result["rows_per_sec"], result["p50_ms"],
+                                                 result["p99_ms"], result["peak_kb"]))
+        if not args.save and name in baselines:
+            for failure in regressions(name, result, baselines[name], args.tolerance):
+                failed = True
+                print("  REGRESSION: %s" % failure)
+
+    if args.save:
+        baselines.update(results)
+        with open(BASELINES, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print("saved baselines to %s" % BASELINES)
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,24 @@
 from contextlib import contextmanager
 
-from .base_api import API
+from .base_api import API, account_override, default_api, use_client
+from .async_api import AsyncAPI
+from .client import Client
+from .cache import (
+    ResourceCache,
+    QueryCache,
+    DEFAULT_TTL,
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_MAX_ROWS
+)
+from .rate_limit import RateLimiter, RetryPolicy
+from .metrics import Metrics, MemorySink, PrometheusSink, LoggingSink, StatsDSink
+from .single_flight import SingleFlight
 from .errors import InterfaceError, APIRequestError, BoomiError
 from .resource import Resource
+from .query import Q, IN_LIST_LIMIT
 from . import actions
+from . import sync
+from . import mirror
 
 __version__ = "0.0.4"
 
@@ -13,18 +28,103 @@ def set_auth(account_id, username, password):
     """ Sets the auth on the API singleton. """
     API()._set_auth(account_id, username, password)
 
+def set_concurrency(concurrency):
+    """ Sets the max number of requests the *_async methods will have in flight at once. """
+    AsyncAPI().configure(concurrency)
+
+def configure_http(pool_connections=None, pool_size=None, connect_timeout=None, read_timeout=None,
+                   compress=None, keepalive=None):
+    """ Tunes the connections the API singleton makes to boomi. Settings left as None keep their
+        current value. pool_size is the max number of connections per host; requests beyond it wait
+        for a free connection. compress asks boomi for gzip/deflate responses. """
+    api = default_api()
+    settings = {
+        "pool_connections": pool_connections,
+        "pool_size": pool_size,
+        "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout,
+        "compress": compress,
+        "keepalive": keepalive,
+    }
+    for name, value in settings.iteritems():
+        if value is not None:
+            setattr(api, name, value)
+
+    if api.session is not None:
+        api.session = api._session_with_headers()
+
+def connection_stats():
+    """ Returns how many connections have been opened to boomi and how many requests reused one. """
+    return API().connection_stats()
+
+def set_rate_limiter(rate_limiter):
+    """ Replaces the rate limiter on the API singleton. Pass None to disable throttling and
+        retries entirely. """
+    default_api().rate_limiter = rate_limiter
+
+def rate_limit_stats():
+    """ Returns the request, retry and throttling counters from the current rate limiter. """
+    limiter = API().rate_limiter
+    return limiter.stats() if limiter is not None else {}
+
+def enable_cache(default_ttl=DEFAULT_TTL, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+    """ Turns on the read through cache for Resource.get. `ttls` maps resource type names
+        (e.g. "Account") to how many seconds their entities are cached for. """
+    default_api().cache = ResourceCache(default_ttl=default_ttl, ttls=ttls, max_entries=max_entries)
+    return default_api().cache
+
+def disable_cache():
+    default_api().cache = None
+
+def cache_stats():
+    """ Returns the hit, miss and invalidation counters of the get cache. """
+    cache = API().cache
+    return cache.stats() if cache is not None else {}
+
+def enable_query_cache(default_ttl=DEFAULT_TTL, ttls=None, max_rows=DEFAULT_MAX_ROWS):
+    """ Turns on caching of fully paged query results. `max_rows` bounds the total number of rows
+        held across all cached queries. Pass refresh=True to query() to skip the cache. """
+    default_api().query_cache = QueryCache(default_ttl=default_ttl, ttls=ttls, max_rows=max_rows)
+    return default_api().query_cache
+
+def disable_query_cache():
+    default_api().query_cache = None
+
+def query_cache_stats():
+    """ Returns the hit, miss and invalidation counters of the query cache. """
+    cache = API().query_cache
+    return cache.stats() if cache is not None else {}
+
+def enable_metrics(*sinks):
+    """ Starts measuring request latency, bytes sent and received, retries, throttling, paging and
+        decode time, and sends every measurement to `sinks`. """
+    default_api().metrics = Metrics(sinks)
+    return default_api().metrics
+
+def disable_metrics():
+    default_api().metrics = None
+
+def enable_single_flight():
+    """ Makes concurrent identical reads (gets, queries and queryMores with the same url, sub
+        account, body and credentials) share one request to boomi instead of sending one each. """
+    default_api().single_flight = SingleFlight()
+    return default_api().single_flight
+
+def disable_single_flight():
+    default_api().single_flight = None
+
+def single_flight_stats():
+    """ Returns how many requests were sent and how many callers shared another's request. """
+    single_flight = API().single_flight
+    return single_flight.stats() if single_flight is not None else {}
+
 # Override the account_id value to pull info for partner accounts
 @contextmanager
 def sub_account(acct_id):
-    """ Used for accessing a sub account while persisting youre current api credentials. """
-    api = API()
-    old_boomi_id = api.partner_account
-    api.partner_account = acct_id
-
-    try:
+    """ Used for accessing a sub account while persisting youre current api credentials. The
+        override only applies to the current thread, and to calls it hands off to other threads. """
+    with account_override(acct_id):
         yield
-    finally:
-        api.partner_account = old_boomi_id
 
 class Account(Resource):
     _id_attr = "accountId"
@@ -38,6 +138,7 @@ class Account(Resource):
         "post": True,
         "delete": True,
         "query": True,
+        "bulk": True,
     }
 
     # Override the base Resource.url because of some partner stuff while creating an account
@@ -52,7 +153,10 @@ class Account(Resource):
             raise BoomiError("Cannot call delete() on object which has not been saved yet.")
 
         url = "%s/%s/%s" % (API().base_url(partner=True), self._uri, getattr(self, self._id_attr))
-        self._https_request(url, method="delete", data=self.serialize())
+        try:
+            self._https_request(url, method="delete", data=self.serialize())
+        finally:
+            self._invalidate_cache()
 
 class Role(Resource):
     _id_attr = "id"
@@ -103,28 +207,32 @@ entities = (
         ("AccountGroup", ("id", "defaultGroup", "name", "accountId"), {"delete": False}),
         ("AccountGroupAccount", ("id", "accountId", "accountGroupId"), {"put": False}),
         ("Atom", ("instanceId", "currentVersion", "dateInstalled", "hostName", "type", "status",
-                  "name", "id", "cloudId"), {}),
+                  "name", "id", "cloudId"), {"bulk": True}),
         ("AtomExtensions", ("id", "extensionGroupId", "atomId"), {"post": False, "delete": False}),
         ("AtomMapExtension", ("name", "mapId", "processId", "id", "extensionGroupId", "atomId"),
             {"query": False, "post": False, "delete": False}),
         ("AtomMapExtensionsSummary", ("name", "mapId", "processId", "id", "extensionGroupId",
                                       "atomId", "DestinationFieldSet", "SourceFieldSet"),
-            {"get": False, "post": False, "put": False, "delete": False}),
+            {"get": False, "post": False, "put": False, "delete": False,
+             "nested": ("DestinationFieldSet", "SourceFieldSet")}),
         ("Deployment", ("id", "digest", "environmentId", "processId"),
-            {"put": False, "delete": False}),
-        ("Environment", ("id", "name", "classification"), {}),
+            {"put": False, "delete": False, "bulk": True}),
+        ("Environment", ("id", "name", "classification"), {"bulk": True}),
         ("EnvironmentAtomAttachment", ("atomId", "environmentId", "id"),
             {"get": False, "put": False}),
         ("EnvironmentExtensions",
             ("id", "extensionGroupId", "environmentId", "processProperties", "connections"),
-            {"post": False, "delete": False}),
+            {"post": False, "delete": False, "bulk": True,
+             "nested": ("processProperties", "connections"), "required": ("environmentId",),
+             "partial": {"partial": True}}),
         ("EnvironmentMapExtension",
             ("name", "mapId", "processId", "id", "extensionGroupId", "environmentId"),
             {"query": False, "post": False, "delete": False}),
         ("EnvironmentMapExtensionsSummary",
             ("name", "mapId", "processId", "id", "extensionGroupId", "environmentId",
                 "DestinationFieldSet", "SourceFieldSet"),
-            {"get": False, "post": False, "put": False, "delete": False}),
+            {"get": False, "post": False, "put": False, "delete": False,
+             "nested": ("DestinationFieldSet", "SourceFieldSet")}),
         ("Event", ("eventId", "accountId", "atomId", "atomName", "eventLevel", "eventDate",
                     "status", "eventType", "executionId", "title", "startTime", "endTime",
                     "errorDocumentCount", "inboundDocumentCount", "outboundDocumentCount",
@@ -134,22 +242,23 @@ entities = (
         ("InstallerToken", ("id", "installType", "durationMinutes", "cloudId", "token", "expiration", "created", "accountId"),
             {"query": False, "put": False, "get": False, "delete": False, "post": True}),
         ("IntegrationPack", ("id", "name", "Description", "installationType"),
-            {"put": False, "post": False, "delete": False}),
+            {"put": False, "post": False, "delete": False, "bulk": True}),
         ("IntegrationPackInstance", ("id", "integrationPackOverrideName", "integrationPackId"),
-            {"put": False, "get": True, "query": True, "post": True, "delete": True}),
+            {"put": False, "get": True, "query": True, "post": True, "delete": True, "bulk": True}),
         ("IntegrationPackAtomAttachment", ("id", "atomId", "integrationPackInstanceId"),
             {"get": False, "put": False}),
         ("IntegrationPackEnvironmentAttachment",
             ("id", "environmentId", "integrationPackInstanceId"), {"put": False, "get": False}),
         ("Process", ("id", "name", "integrationpackInstanceId", "integrationpackId"),
-            {"post": False, "put": False, "delete": False}),
+            {"post": False, "put": False, "delete": False, "bulk": True}),
         ("ProcessAtomAttachment", ("atomId", "processId", "id"), {"get": False, "put": False}),
         ("ProcessEnvironmentAttachment", ("environmentId", "processId", "id"),
             {"get": False, "put": False}),
         ("ProcessSchedules", ("id", "atomId", "Schedule", "processId"),
-            {"post": False, "delete": False, "put": True}),
+            {"post": False, "delete": False, "put": True, "bulk": True, "nested": ("Schedule",),
+             "required": ("atomId", "processId")}),
         ("ProcessScheduleStatus", ("enabled", "id", "atomId", "processId"),
-            {"post": False, "delete": False}),
+            {"post": False, "delete": False, "bulk": True}),
         ("Role", ("parentId", "name", "accountId", "id"),
             {"post": False, "get": False, "put": False, "delete": False}),
 )
@@ -1,15 +1,17 @@
 import functools
 import json
-import time
 
 import boompy
 from .base_api import API
 from .errors import UnauthorizedError, BoomiError
+from .poller import Future, Poller
 
-api = API()
+# How long the *Async account provisioning functions wait for boomi before giving up, in seconds.
+PROVISION_TIMEOUT = 600
 
 def getAssignableRoles():
     """ Returns a list of assignable Role objects. """
+    api = API()
     results = []
     res = api.https_request("%s/getAssignableRoles" % api.base_url(), "get", {})
 
@@ -19,14 +21,41 @@ def getAssignableRoles():
     return results
 
 def executeProcess(process_id, atom_id):
+    api = API()
     data = {"processId": process_id, "atomId": atom_id}
     api.https_request("%s/executeProcess" % api.base_url(), "post", data)
 
-def provisionPartnerCustomerAccount(data=None):
+def _watch_account_provision(results, error_message, timeout):
+    """ Returns a Future for the AccountProvision job described by `results`. Jobs which are still
+        PENDING are polled by the shared Poller until they leave that state. """
+
+    def check(future, results):
+        # According to Boomi docs looks like status will only be pending or completed
+        if results.get("status") == "PENDING":
+            return
+        if results.get("status") != "COMPLETED":
+            future.set_error(BoomiError("%s, status=%s" % (error_message, results.get("status"))))
+        else:
+            future.set_result(results)
+
+    if results.get("status") != "PENDING":
+        future = Future()
+        check(future, results)
+        return future
+
+    url = "%s/AccountProvision/%s" % (API().base_url(partner=True), results.get("id"))
+
+    def poll():
+        # Poller.watch runs this with the caller's client, which API() picks up.
+        return json.loads(API().https_request(url, "get", {}).content)
+
+    return Poller().watch(poll, check, timeout=timeout)
+
+def provisionPartnerCustomerAccountAsync(data=None, timeout=PROVISION_TIMEOUT):
     """
-    Method that will use the Boomi action to provision a new account for
-    the data passed in, if the required field(s) are missing from the dictionary
-    then a Boomi Error is raised
+    Non blocking provisionPartnerCustomerAccount. Starts the provisioning and returns a Future
+    whose get() returns the results once boomi has finished, or raises a BoomiError if it failed
+    or took longer than `timeout` seconds.
     """
 
     if data is None:
@@ -36,6 +65,7 @@ def provisionPartnerCustomerAccount(data=None):
                         "countryCode", "status", "product"}
 
     # It takes about a minute for this process to complete
+    api = API()
     base_url = "%s/AccountProvision" % api.base_url(partner=True)
 
     missing_fields = PROVISION_FIELDS - set(data.keys())
@@ -43,24 +73,24 @@ def provisionPartnerCustomerAccount(data=None):
     if not missing_fields:
         res = api.https_request("%s/execute" % base_url, "post", data)
         results = json.loads(res.content)
-
-        # According to Boomi docs looks like status will only be pending or completed
-        while results.get("status") == "PENDING":
-            time.sleep(2)
-            result = api.https_request("%s/%s" % (base_url, results.get("id")), "get", {})
-            results = json.loads(result.content)
-        if results.get("status") != "COMPLETED":
-            raise BoomiError("failed provisioning account, status=%s" % results.get("status"))
-        else:
-            return results
+        return _watch_account_provision(results, "failed provisioning account", timeout)
     else:
         raise BoomiError(("incomplete provison data provided, you are missing "
                           "the following fields: ") + str(list(missing_fields)))
 
-def updatePartnerCustomerAccount(data=None):
+def provisionPartnerCustomerAccount(data=None):
     """
-    Method that will use the Boomi action to update an account for the data
-    passed in
+    Method that will use the Boomi action to provision a new account for
+    the data passed in, if the required field(s) are missing from the dictionary
+    then a Boomi Error is raised
+    """
+
+    return provisionPartnerCustomerAccountAsync(data, timeout=None).get()
+
+def updatePartnerCustomerAccountAsync(data=None, timeout=PROVISION_TIMEOUT):
+    """
+    Non blocking updatePartnerCustomerAccount. Returns a Future like
+    provisionPartnerCustomerAccountAsync.
     """
 
     if data is None:
@@ -69,12 +99,17 @@ def updatePartnerCustomerAccount(data=None):
     if data.get("id") is None:
         raise BoomiError("missing the field id in dict")
 
+    api = API()
     base_url = "%s/AccountProvision/%s" % (api.base_url(partner=True), data.get("id"))
 
     res = api.https_request(base_url, "post", data)
     results = json.loads(res.content)
+    return _watch_account_provision(results, "failed updating account", timeout)
 
-    if results.get("status") != "COMPLETED":
-        raise BoomiError("failed updating account, status=%s" % results.get("status"))
-    else:
-        return results
+def updatePartnerCustomerAccount(data=None):
+    """
+    Method that will use the Boomi action to update an account for the data
+    passed in
+    """
+
+    return updatePartnerCustomerAccountAsync(data, timeout=None).get()
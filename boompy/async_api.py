@@ -0,0 +1,55 @@
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+from .base_api import DEFAULT_POOL_SIZE, bind_context, default_api
+
+# Marks the threads of the worker pool.
+_worker = threading.local()
+
+def _mark_worker():
+    _worker.active = True
+
+class AsyncAPI(object):
+    """ Runs blocking API calls on a bounded pool of worker threads so many requests to boomi can be
+        in flight at once. Calls return an AsyncResult; calling .get() on it returns the value or
+        raises the same error the blocking call would have raised. """
+    pool = None
+    concurrency = DEFAULT_POOL_SIZE
+    __instance = None
+
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(AsyncAPI, cls).__new__(cls)
+        return cls.__instance
+
+    def configure(self, concurrency):
+        """ Sets the max number of concurrent requests. The connection pool on the API singleton is
+            resized to match so workers never wait on each other for a connection. Clients keep the
+            connection pool they were made with. """
+        self.close()
+        self.concurrency = concurrency
+
+        api = default_api()
+        api.pool_size = concurrency
+        if api.session is not None:
+            api.session = api._session_with_headers()
+
+    def submit(self, fn, *args, **kwargs):
+        """ Schedules fn(*args, **kwargs) on the worker pool. It runs with the client and sub
+            account the caller is using. """
+        if self.pool is None:
+            self.pool = ThreadPool(self.concurrency, initializer=_mark_worker)
+        return self.pool.apply_async(bind_context(fn), args, kwargs)
+
+    def in_worker(self):
+        """ Whether the calling thread is one of the pool's workers. A worker which submits more
+            work and waits on it can deadlock the pool, since the work may queue behind it. """
+        return getattr(_worker, "active", False)
+
+    def close(self):
+        """ Waits for in flight calls to finish and shuts down the worker pool. """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -1,5 +1,9 @@
 import requests
 import json
+import threading
+import time
+
+from contextlib import contextmanager
 
 from requests.status_codes import codes as status_codes
 
@@ -10,58 +14,191 @@ from .errors import (
     RateLimitError,
     BoomiError
 )
+from .metrics import request_tags, response_size
+from .rate_limit import RateLimiter, retry_after_seconds
+from .single_flight import is_read
+from .transport import (
+    BoomiAdapter,
+    DEFAULT_POOL_CONNECTIONS,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT
+)
 
 BASE_URL = "https://api.boomi.com/api/rest/v1"
 PARTNER_BASE_URL = "https://api.boomi.com/partner/api/rest/v1"
 
+# Upper bound on the number of open connections to boomi. Requests beyond this wait for a free
+# connection instead of opening a new one.
+DEFAULT_POOL_SIZE = 10
+
+# The client each thread is using, set by use_client().
+_context = threading.local()
+
+class APIMeta(type):
+    """ Makes API() return the client the current thread is using, if there is one, instead of the
+        singleton. This is how module level functions and resources route through a Client. """
+
+    def __call__(cls, *args, **kwargs):
+        if cls is API:
+            client = getattr(_context, "client", None)
+            if client is not None:
+                return client
+        return super(APIMeta, cls).__call__(*args, **kwargs)
+
+
 class API(object):
+    __metaclass__ = APIMeta
     session = None
-    partner_account = None
     account_id = None
     username = None
     password = None
+    pool_size = DEFAULT_POOL_SIZE
+    pool_connections = DEFAULT_POOL_CONNECTIONS
+    connect_timeout = DEFAULT_CONNECT_TIMEOUT
+    read_timeout = DEFAULT_READ_TIMEOUT
+    compress = True
+    keepalive = True
+    rate_limiter = RateLimiter()
+    cache = None
+    query_cache = None
+    metrics = None
+    single_flight = None
     __instance = None
+    _local = threading.local()
+    _default_partner_account = None
 
     def __new__(cls):
         if cls.__instance is None:
             cls.__instance = super(API, cls).__new__(cls)
         return cls.__instance
 
+    def _get_partner_account(self):
+        return getattr(self._local, "partner_account", self._default_partner_account)
+
+    def _set_partner_account(self, account):
+        self._local.partner_account = account
+
+    # The sub account requests are sent for. It is kept per thread so threads working in different
+    # sub accounts don't overwrite each other's override.
+    partner_account = property(_get_partner_account, _set_partner_account)
+
     def _set_auth(self, account_id, username, password):
         self.account_id = account_id
         self.username = username
         self.password = password
+        if self.rate_limiter is not None:
+            self.rate_limiter.reset((account_id, self.partner_account))
         self.session = self._session_with_headers()
 
-    def https_request(self, url, method, data):
+    def https_request(self, url, method, data, stream=False):
+        """ Sends a request to boomi and maps error responses onto exceptions. With stream=True the
+            body is left unread so it can be decoded as it arrives. """
         if self.partner_account:
             url = "%s?overrideAccount=%s" % (url, self.partner_account)
 
         if not isinstance(data, basestring):
             data = json.dumps(data)
 
-        fn = getattr(self.session, method)
-        try:
-            res = fn(url, data=data)
-        except Exception, e:
-            raise BoomiError(e)
+        single_flight = self.single_flight
+        if single_flight is not None and is_read(url, method):
+            # The username is part of the key so a caller never gets a response its own
+            # credentials weren't checked for.
+            key = (method, url, data, self.username)
+            res, shared = single_flight.do(key, lambda: self.__request(url, method, data, stream),
+                                           share=read_body if stream else None)
+            if shared and self.metrics is not None:
+                self.metrics.count("request.coalesced", **request_tags(url, method))
+            return res
+
+        return self.__request(url, method, data, stream)
+
+
+    def __request(self, url, method, data, stream):
+        metrics = self.metrics
+        if metrics is None:
+            res = self.__send(url, method, data, stream)
+        else:
+            tags = request_tags(url, method)
+            start = time.time()
+            try:
+                res = self.__send(url, method, data, stream, metrics, tags)
+            finally:
+                metrics.timing("request.latency", time.time() - start, **tags)
+            metrics.count("request.bytes_out", len(data), **tags)
+            size = response_size(res, stream)
+            if size is not None:
+                metrics.count("request.bytes_in", size, **tags)
+            metrics.count("request.responses", status=res.status_code, **tags)
 
         if res.status_code == status_codes.OK:
             return res
-        elif res.status_code in (status_codes.SERVICE_UNAVAILABLE, status_codes.TOO_MANY):
-            raise RateLimitError(res)
         elif res.status_code == status_codes.NOT_FOUND:
             raise NotFoundError(res)
         else:
             raise APIRequestError(res)
 
 
+    def __send(self, url, method, data, stream, metrics=None, tags=None):
+        """ Sends the request, waiting on the rate limiter and retrying it while boomi says to back
+            off. Returns the first response which wasn't a 429 or 503. """
+        fn = getattr(self.session, method)
+        kwargs = {"stream": True} if stream else {}
+        limiter = self.rate_limiter
+        key = (self.account_id, self.partner_account)
+        attempt = 0
+
+        while True:
+            if limiter is not None:
+                waited = limiter.acquire(key)
+                if waited and metrics is not None:
+                    metrics.timing("request.throttle", waited, **tags)
+
+            try:
+                res = fn(url, data=data, **kwargs)
+            except Exception, e:
+                raise BoomiError(e)
+
+            if res.status_code not in (status_codes.SERVICE_UNAVAILABLE, status_codes.TOO_MANY):
+                break
+
+            if limiter is None:
+                raise RateLimitError(res)
+
+            retry_after = retry_after_seconds(res)
+            limiter.rate_limited(key, retry_after)
+            if metrics is not None:
+                metrics.count("request.rate_limited", **tags)
+            if attempt >= limiter.retry.max_retries or not limiter.retry.is_retryable(method, url):
+                raise RateLimitError(res)
+
+            res.close()
+            delay = limiter.backoff(attempt, retry_after)
+            if metrics is not None:
+                metrics.count("request.retries", **tags)
+                metrics.timing("request.backoff", delay, **tags)
+            attempt += 1
+
+        return res
+
+
     def base_url(self, partner=False):
         if self.account_id is None:
             raise UnauthorizedError("Boomi account id not provied")
 
         return "%s/%s" % (PARTNER_BASE_URL if (partner or self.partner_account) else BASE_URL, self.account_id)
 
+    def _adapter(self):
+        return BoomiAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_size,
+                            connect_timeout=self.connect_timeout, read_timeout=self.read_timeout,
+                            keepalive=self.keepalive)
+
+    def connection_stats(self):
+        """ Connection reuse counters of the session's connection pools. """
+        if self.session is None:
+            return {}
+        adapter = self.session.get_adapter(BASE_URL)
+        return adapter.stats() if hasattr(adapter, "stats") else {}
+
     def _session_with_headers(self):
         if self.username is None:
             raise UnauthorizedError("Boomi username not provied")
@@ -71,9 +208,56 @@ class API(object):
 
         session = requests.session()
         session.auth = (self.username, self.password)
+        session.mount("https://", self._adapter())
         session.headers.update({
             "Content-Type": "application/json",
-            "Accept": "application/json"
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate" if self.compress else "identity"
         })
 
         return session
+
+
+def read_body(res):
+    """ Reads the whole body of a streamed response, so it can be decoded by more than one caller. """
+    res.content
+    return res
+
+def default_api():
+    """ The API singleton, even while a thread is using a Client. """
+    return API.__new__(API)
+
+@contextmanager
+def use_client(client):
+    """ Sends every request this thread makes through `client` until the block exits. """
+    previous = getattr(_context, "client", None)
+    _context.client = client
+
+    try:
+        yield client
+    finally:
+        _context.client = previous
+
+@contextmanager
+def account_override(account):
+    """ Sends requests made by this thread for the partner sub account `account` until the block
+        exits. """
+    api = API()
+    previous = api.partner_account
+    api.partner_account = account
+
+    try:
+        yield
+    finally:
+        api.partner_account = previous
+
+def bind_context(fn):
+    """ Wraps fn so it runs with the calling thread's client and partner account override, no
+        matter which thread ends up calling it. """
+    client = getattr(_context, "client", None)
+    account = API().partner_account
+
+    def bound(*args, **kwargs):
+        with use_client(client), account_override(account):
+            return fn(*args, **kwargs)
+    return bound
@@ -0,0 +1,42 @@
+class BatchResult(object):
+    """ The outcome of an operation on many items at once. results holds one slot per input, in
+        the order the inputs were given, and errors maps the index of every input which failed to
+        the exception it failed with. """
+
+    def __init__(self, size):
+        self.results = [None] * size
+        self.errors = {}
+
+    def __len__(self):
+        return len(self.results)
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __getitem__(self, index):
+        return self.results[index]
+
+    def succeed(self, index, value):
+        self.results[index] = value
+
+    def fail(self, index, error):
+        self.errors[index] = error
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def succeeded(self):
+        """ (index, result) for every input which succeeded. """
+        return [(i, result) for i, result in enumerate(self.results) if i not in self.errors]
+
+    @property
+    def failed(self):
+        """ (index, error) for every input which failed. """
+        return sorted(self.errors.items())
+
+    def raise_for_errors(self):
+        """ Raises the error of the first input which failed, if any did. """
+        if self.errors:
+            raise self.errors[min(self.errors)]
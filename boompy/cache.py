@@ -0,0 +1,239 @@
+import copy
+import json
+import threading
+import time
+
+from collections import OrderedDict
+
+from .base_api import API
+from .resource import ResourceList
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_ROWS = 100000
+
+# Returned by LRUCache.get for keys which are missing or expired.
+MISSING = object()
+
+class LRUCache(object):
+    """ A thread safe, bounded cache whose entries expire after a ttl. Each entry has a size (1 by
+        default); once the sizes add up to more than max_size, the least recently used entries are
+        evicted. An entry bigger than max_size on its own is never cached. """
+
+    def __init__(self, max_size=DEFAULT_MAX_ENTRIES):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return MISSING
+            if entry[1] <= time.time():
+                self.size -= entry[2]
+                return MISSING
+            self.entries[key] = entry
+            return entry[0]
+
+    def set(self, key, value, ttl, size=1):
+        """ Caches value under key. Returns False, and drops any older value for key, when the
+            entry is too big to fit. """
+        with self.lock:
+            self.__pop(key)
+            if size > self.max_size:
+                return False
+            self.entries[key] = (value, time.time() + ttl, size)
+            self.size += size
+            while self.size > self.max_size and self.entries:
+                self.size -= self.entries.popitem(last=False)[1][2]
+            return True
+
+    def __pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def delete(self, key):
+        with self.lock:
+            self.__pop(key)
+
+    def delete_where(self, predicate):
+        """ Deletes every entry whose key matches predicate(key). """
+        with self.lock:
+            for key in [key for key in self.entries if predicate(key)]:
+                self.__pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class ResourceCache(object):
+    """ Read through cache for Resource.get. Entries are keyed by (account, partner account,
+        resource type, id), so entities read inside a sub_account never leak into another account.
+
+        `ttls` maps a resource type name to the number of seconds its entities are cached for;
+        types missing from it use `default_ttl`. A ttl of 0 turns caching off for that type. """
+
+    def __init__(self, default_ttl=DEFAULT_TTL, ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.entries = LRUCache(max_entries)
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+        # key -> [loads in flight, invalidations since the first of them started]
+        self.loads = {}
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats["size"] = len(self.entries)
+        return stats
+
+    def __count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def ttl(self, resource):
+        return self.ttls.get(resource._name, self.default_ttl)
+
+    def key(self, resource, boomi_id):
+        api = API()
+        return (api.account_id, api.partner_account, resource._name, boomi_id)
+
+    def get(self, resource, boomi_id):
+        """ Returns a copy of the cached entity, or None. """
+        if not self.ttl(resource):
+            return None
+
+        entity = self.entries.get(self.key(resource, boomi_id))
+        if entity is MISSING:
+            self.__count("misses")
+            return None
+
+        self.__count("hits")
+        return copy.deepcopy(entity)
+
+    def load(self, resource, boomi_id, fetch):
+        """ Returns fetch(), and caches it unless boomi_id was invalidated while fetch() ran,
+            since the entity it read may be from before that write. """
+        ttl = self.ttl(resource)
+        if not ttl:
+            return fetch()
+
+        key = self.key(resource, boomi_id)
+        with self.lock:
+            load = self.loads.setdefault(key, [0, 0])
+            load[0] += 1
+            invalidations = load[1]
+
+        cached = None
+        try:
+            entity = fetch()
+            cached = copy.deepcopy(entity)
+        finally:
+            with self.lock:
+                load[0] -= 1
+                if not load[0]:
+                    del self.loads[key]
+                if cached is not None and load[1] == invalidations:
+                    self.entries.set(key, cached, ttl)
+        return entity
+
+    def invalidate(self, resource, boomi_id):
+        key = self.key(resource, boomi_id)
+        # Under the lock, so a load finishing now either sees this or has its entry deleted by it.
+        with self.lock:
+            self.counters["invalidations"] += 1
+            load = self.loads.get(key)
+            if load is not None:
+                load[1] += 1
+            self.entries.delete(key)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def canonical_query(q):
+    """ Returns a string which is the same for every QueryFilter that means the same thing, no
+        matter what order the kwargs or nested expressions were given in. """
+    def canonical(expression):
+        if "nestedExpression" in expression:
+            nested = sorted((canonical(e) for e in expression["nestedExpression"]),
+                            key=lambda e: json.dumps(e, sort_keys=True))
+            return {"operator": expression["operator"].lower(), "nestedExpression": nested}
+        return expression
+
+    expression = q.get("QueryFilter", {}).get("expression")
+    return json.dumps(canonical(expression) if expression else None, sort_keys=True)
+
+
+class QueryCache(object):
+    """ Caches the fully paged results of Resource.query. Entries are keyed by (account, partner
+        account, resource type, canonical filter) and sized by their number of rows, so max_rows
+        bounds how many rows the cache holds in total. A write to a resource type drops every
+        cached query for that type. """
+
+    def __init__(self, default_ttl=DEFAULT_TTL, ttls=None, max_rows=DEFAULT_MAX_ROWS):
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.entries = LRUCache(max_rows)
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+        stats["size"] = len(self.entries)
+        stats["rows"] = self.entries.size
+        return stats
+
+    def __count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def ttl(self, resource):
+        return self.ttls.get(resource._name, self.default_ttl)
+
+    def key(self, resource, q, records=False):
+        api = API()
+        return (api.account_id, api.partner_account, resource._name, canonical_query(q), records)
+
+    def get(self, resource, q, records=False):
+        """ Returns a copy of the cached results, or None. """
+        if not self.ttl(resource):
+            return None
+
+        rows = self.entries.get(self.key(resource, q, records))
+        if rows is MISSING:
+            self.__count("misses")
+            return None
+
+        self.__count("hits")
+        return ResourceList.from_rows(resource, copy.deepcopy(rows), records=records)
+
+    def set(self, resource, q, results, records=False):
+        """ Pages through all of `results`, caches them, and returns them as a fully loaded list.
+            Results with more rows than the whole cache holds aren't cached, or even copied. """
+        rows = list(results)
+        ttl = self.ttl(resource)
+        if ttl:
+            key = self.key(resource, q, records)
+            if len(rows) <= self.entries.max_size:
+                self.entries.set(key, copy.deepcopy(rows), ttl, size=max(len(rows), 1))
+            else:
+                self.entries.delete(key)
+        return ResourceList.from_rows(resource, rows, records=records)
+
+    def invalidate(self, resource):
+        self.__count("invalidations")
+        self.entries.delete_where(lambda key: key[2] == resource._name)
+
+    def clear(self):
+        self.entries.clear()
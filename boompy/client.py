@@ -0,0 +1,65 @@
+import threading
+
+from .base_api import API, default_api
+from .transport import BoomiAdapter
+
+_shared_adapter = None
+_shared_adapter_lock = threading.Lock()
+
+# Lets Client tell "use the default rate limiter (or metrics)" apart from rate_limiter=None.
+_DEFAULT = object()
+
+def shared_adapter():
+    """ The connection pool every Client uses unless it is given its own. """
+    global _shared_adapter
+    with _shared_adapter_lock:
+        if _shared_adapter is None:
+            _shared_adapter = BoomiAdapter()
+        return _shared_adapter
+
+
+class Client(API):
+    """ An API with its own credentials and settings, so one process can work for many boomi
+        accounts at once. A client's config can't be changed once it is made. Use it for a block
+        with boompy.use_client(client); everything that thread does in the block (and the async
+        calls it starts) goes through the client.
+
+        Clients share the default rate limiter, metrics, single flight and one connection pool unless
+        they are given their own. partner_account is the sub account used when no sub_account
+        override is active. """
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, account_id, username, password, partner_account=None,
+                 rate_limiter=_DEFAULT, cache=None, query_cache=None, adapter=None, metrics=_DEFAULT,
+                 single_flight=_DEFAULT):
+        config = {
+            "account_id": account_id,
+            "username": username,
+            "password": password,
+            "_default_partner_account": partner_account,
+            "rate_limiter": default_api().rate_limiter if rate_limiter is _DEFAULT else rate_limiter,
+            "cache": cache,
+            "query_cache": query_cache,
+            "adapter": adapter,
+            "metrics": default_api().metrics if metrics is _DEFAULT else metrics,
+            "single_flight": (default_api().single_flight if single_flight is _DEFAULT
+                              else single_flight),
+            "_local": threading.local(),
+        }
+        for name, value in config.iteritems():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "session", self._session_with_headers())
+
+    def __setattr__(self, name, value):
+        # The partner account override is kept per thread, so it is the one thing which may change.
+        if name != "partner_account":
+            raise AttributeError("Client config can't be changed; make a new Client instead")
+        object.__setattr__(self, name, value)
+
+    def __repr__(self):
+        return "Client(%r)" % self.account_id
+
+    def _adapter(self):
+        return self.adapter or shared_adapter()
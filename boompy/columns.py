@@ -0,0 +1,93 @@
+from datetime import datetime
+from numbers import Number
+
+from .errors import BoomiError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class ColumnBuilder(object):
+    """ Accumulates rows as one list of values per attribute instead of one object per row. """
+
+    def __init__(self, resource):
+        self.attributes = resource._attributes
+        self.columns = [[] for _ in self.attributes]
+
+    def append(self, values):
+        """ Appends one row, given as values in the order of the resource's _attributes. """
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def to_columns(self):
+        return dict(zip(self.attributes, self.columns))
+
+    def to_arrays(self):
+        if numpy is None:
+            raise BoomiError("numpy is required for to_arrays()")
+        return dict((attr, to_array(column)) for attr, column in zip(self.attributes, self.columns))
+
+
+class DictionaryArray(object):
+    """ A dictionary encoded column of strings. codes holds an index into categories for each
+        row, or -1 where the value was missing. """
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        code = self.codes[index]
+        return None if code < 0 else self.categories[code]
+
+    def decode(self):
+        """ Returns the column as an object array of the original values. """
+        values = numpy.empty(len(self.codes), dtype=object)
+        values[:] = [None if code < 0 else self.categories[code] for code in self.codes]
+        return values
+
+
+def dictionary_encode(values):
+    lookup = {}
+    categories = []
+    codes = numpy.empty(len(values), dtype=numpy.int32)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(categories)
+            categories.append(value)
+        codes[i] = code
+    return DictionaryArray(codes, categories)
+
+
+def to_array(values):
+    """ Converts a column of decoded values into the most compact array which can hold it: dates
+        become datetime64, numbers int64 (float64 if any are missing) and strings are dictionary
+        encoded. Anything else is left in an object array. """
+    present = [value for value in values if value is not None]
+
+    if present and all(isinstance(value, datetime) for value in present):
+        return numpy.array(["NaT" if value is None else value for value in values],
+                           dtype="datetime64[s]")
+
+    if present and all(isinstance(value, Number) and not isinstance(value, bool)
+                       for value in present):
+        if len(present) == len(values) and all(isinstance(value, (int, long))
+                                               for value in present):
+            return numpy.array(values, dtype=numpy.int64)
+        return numpy.array([numpy.nan if value is None else value for value in values],
+                           dtype=numpy.float64)
+
+    if all(isinstance(value, basestring) for value in present):
+        return dictionary_encode(values)
+
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
@@ -53,3 +53,14 @@ class APIMethodNotAllowedError(BoomiError):
 
     def __str__(self):
         return self.message
+
+class BulkItemError(BoomiError):
+    """ Raised (or reported) for a single item of a bulk request which boomi could not process. """
+    def __init__(self, boomi_id, status_code, message):
+        super(BulkItemError, self).__init__()
+        self.boomi_id = boomi_id
+        self.status_code = status_code
+        self.message = "%s: %s (%s)" % (status_code, message, boomi_id)
+
+    def __str__(self):
+        return self.message
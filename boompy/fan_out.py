@@ -0,0 +1,77 @@
+import threading
+
+from Queue import Queue, Full
+
+from .async_api import AsyncAPI
+from .base_api import account_override
+
+# Placed on the queue by each account once it has no more rows.
+_ACCOUNT_DONE = object()
+
+# How many rows may be buffered before the workers wait for the consumer to catch up.
+DEFAULT_BUFFER = 1000
+
+class FanOut(object):
+    """ Runs fn(*args, **kwargs) in every partner sub account in `account_ids` at once on the
+        AsyncAPI worker pool. fn must return an iterable, like the ResourceList returned by query().
+
+        Iterating yields (account_id, row) pairs in the order the rows arrive, so results from fast
+        accounts are not held up by slow ones. An account which fails doesn't stop the others;
+        errors maps each account which failed to the exception it failed with. """
+
+    def __init__(self, account_ids, fn, *args, **kwargs):
+        self.account_ids = list(account_ids)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.buffer = DEFAULT_BUFFER
+        self.errors = {}
+
+    def __iter__(self):
+        self.errors = {}
+        rows = Queue(maxsize=self.buffer)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    rows.put(item, timeout=.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def run(account_id):
+            try:
+                with account_override(account_id):
+                    for row in self.fn(*self.args, **self.kwargs):
+                        if not put((account_id, row)):
+                            return
+            except Exception, e:
+                self.errors[account_id] = e
+            put((account_id, _ACCOUNT_DONE))
+
+        async_api = AsyncAPI()
+        for account_id in self.account_ids:
+            async_api.submit(run, account_id)
+
+        try:
+            remaining = len(self.account_ids)
+            while remaining:
+                account_id, row = rows.get()
+                if row is _ACCOUNT_DONE:
+                    remaining -= 1
+                else:
+                    yield account_id, row
+        finally:
+            stop.set()
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def raise_for_errors(self):
+        """ Raises the error of the first account (in the order given) which failed, if any did. """
+        for account_id in self.account_ids:
+            if account_id in self.errors:
+                raise self.errors[account_id]
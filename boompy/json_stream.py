@@ -0,0 +1,205 @@
+""" Incremental decoding of boomi query responses.
+
+Boomi query pages look like {"@type": "QueryResult", "result": [...], "queryToken": ...,
+"numberOfResults": ...}. Rather than decoding the whole body at once, the top level object is walked
+by hand and each element of "result" is decoded and handed back on its own, as soon as its bytes
+have arrived. """
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 16 * 1024
+
+WHITESPACE = u" \t\n\r"
+DELIMITERS = WHITESPACE + u",:]}"
+
+# Strings (group 1 is None if the string is cut off by the end of the buffer) and brackets.
+STRUCTURE_TOKEN_REGEX = re.compile(r'"(?:[^"\\]|\\.)*(")?|[\[\]{}]')
+
+def strip_type(obj):
+    """ object_hook which drops the "@type" key boomi puts on every object. """
+    obj.pop(u"@type", None)
+    return obj
+
+# Decoder used for everything coming back from boomi, so "@type" is dropped while parsing instead
+# of walking the decoded values afterwards.
+DECODER = json.JSONDecoder(object_hook=strip_type)
+
+def loads(content, lazy_keys=None):
+    """ Decodes a response body. Object or array values of the top level keys in `lazy_keys` are
+        left as RawJSON until they are used. """
+    if not lazy_keys:
+        return DECODER.decode(content)
+    return JSONStreamReader([content]).object_value(lazy_keys)
+
+def response_chunks(response, chunk_size=CHUNK_SIZE):
+    """ Returns an iterable over the body of `response`. Bodies which have not been read yet (the
+        request was made with stream=True) are read from the socket a chunk at a time. """
+    if getattr(response, "_content", None) is False:
+        return response.iter_content(chunk_size)
+    return [response.content]
+
+
+def scan_structure_end(text, pos):
+    """ Returns the offset just past the object or array starting at text[pos], or None if it does
+        not end within text. """
+    depth = 0
+    for match in STRUCTURE_TOKEN_REGEX.finditer(text, pos):
+        token = match.group()
+        if token[0] == u'"':
+            if match.group(1) is None:
+                return None
+        elif token in u"[{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return None
+
+
+class RawJSON(object):
+    """ The undecoded text of a json value. """
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    def decode(self):
+        return DECODER.decode(self.text)
+
+
+class JSONStreamReader(object):
+    """ Reads consecutive json values out of an iterable of byte (or unicode) chunks, only holding
+        the part of the body which has not been decoded yet in memory. """
+
+    def __init__(self, chunks, decoder=None):
+        self.chunks = iter(chunks)
+        self.decoder = decoder or DECODER
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = u""
+        self.pos = 0
+        self.eof = False
+
+    def __read(self):
+        """ Appends the next chunk to the buffer. Returns False once the body is exhausted. """
+        if self.eof:
+            return False
+
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            chunk = self.text_decoder.decode(b"", True)
+        else:
+            if not isinstance(chunk, unicode):
+                chunk = self.text_decoder.decode(chunk)
+
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Returns the next non whitespace character without consuming it, None at the end. """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.__read():
+                return None
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError("Expected %r at offset %s but found %r" % (char, self.pos, found))
+        self.pos += 1
+
+    def value(self):
+        """ Decodes the next json value. """
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                if not self.__read():
+                    raise
+                continue
+
+            # A number which runs up to the end of the buffer might continue in the next chunk.
+            if self.eof or (end < len(self.buf) and self.buf[end] in DELIMITERS):
+                self.pos = end
+                return value
+            self.__read()
+
+    def raw_value(self):
+        """ Returns the next object or array as RawJSON without decoding it. """
+        self.peek()
+        while True:
+            end = scan_structure_end(self.buf, self.pos)
+            if end is not None:
+                raw = RawJSON(self.buf[self.pos:end])
+                self.pos = end
+                return raw
+            if not self.__read():
+                raise ValueError("Unterminated json value at offset %s" % self.pos)
+
+    def object_value(self, lazy_keys):
+        """ Decodes the next object, leaving object or array values of `lazy_keys` as RawJSON. """
+        self.expect(u"{")
+        obj = {}
+        if self.peek() == u"}":
+            self.pos += 1
+            return obj
+
+        while True:
+            key = self.value()
+            self.expect(u":")
+            if key in lazy_keys and self.peek() in u"[{":
+                obj[key] = self.raw_value()
+            else:
+                obj[key] = self.value()
+
+            if self.peek() != u",":
+                break
+            self.expect(u",")
+
+        self.expect(u"}")
+        return strip_type(obj)
+
+
+def iter_query_results(chunks, meta, lazy_keys=None, raw=False):
+    """ Yields each element of the top level "result" array of a query page. Every other top level
+        key is stored in `meta` as it is seen, so meta is only complete once iteration finishes.
+        Values of `lazy_keys` in each result are left as RawJSON. With raw=True every result is
+        left as RawJSON, which only costs finding where it ends. """
+    reader = JSONStreamReader(chunks)
+    reader.expect(u"{")
+    if reader.peek() == u"}":
+        return
+
+    while True:
+        key = reader.value()
+        reader.expect(u":")
+        if key == u"result" and reader.peek() == u"[":
+            reader.expect(u"[")
+            if reader.peek() != u"]":
+                while True:
+                    if raw and reader.peek() in u"[{":
+                        yield reader.raw_value()
+                    elif lazy_keys and reader.peek() == u"{":
+                        yield reader.object_value(lazy_keys)
+                    else:
+                        yield reader.value()
+                    if reader.peek() != u",":
+                        break
+                    reader.expect(u",")
+            reader.expect(u"]")
+        else:
+            meta[key] = reader.value()
+
+        if reader.peek() != u",":
+            break
+        reader.expect(u",")
+
+    reader.expect(u"}")
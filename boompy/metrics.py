@@ -0,0 +1,206 @@
+import bisect
+import logging
+import socket
+import threading
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+# The url suffixes which are reported as their own method instead of the http one.
+NAMED_METHODS = ("query", "queryMore", "bulk")
+
+def request_tags(url, method):
+    """ The resource type and method a request to boomi is reported under, e.g. a POST to
+        .../Atom/query is {"resource": "Atom", "method": "query"}. """
+    path = url.split("?")[0].split("/rest/v1/", 1)[-1].split("/")
+    # path is [account id, resource type, ...]
+    resource = path[1] if len(path) > 1 else ""
+    if len(path) > 2 and path[-1] in NAMED_METHODS:
+        method = path[-1]
+    return {"resource": resource, "method": method}
+
+def response_size(res, stream=False):
+    """ Bytes boomi sent for `res`. Returns None for a streamed response without a Content-Length,
+        since its body hasn't been read yet; query pages count those bytes as they are decoded. """
+    headers = getattr(res, "headers", None)
+    try:
+        return int(headers.get("Content-Length"))
+    except (AttributeError, TypeError, ValueError):
+        pass
+    return None if stream else len(res.content or "")
+
+def counted(chunks, counter):
+    """ Passes `chunks` through, adding up their length in counter[0]. """
+    for chunk in chunks:
+        counter[0] += len(chunk)
+        yield chunk
+
+def tag_key(tags):
+    return tuple(sorted(tags.iteritems()))
+
+
+class Metrics(object):
+    """ Sends every measurement boompy makes to each of `sinks`. A sink is any object with
+        timing(name, seconds, tags) and count(name, value, tags) methods.
+
+        Nothing is measured unless a Metrics is set on the API singleton, so leaving metrics off
+        costs one attribute lookup per request. """
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+
+    def timing(self, name, seconds, **tags):
+        for sink in self.sinks:
+            sink.timing(name, seconds, tags)
+
+    def count(self, name, value=1, **tags):
+        for sink in self.sinks:
+            sink.count(name, value, tags)
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = buckets
+        self.buckets = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """ (upper bound, observations at or under it) for every bucket, ending with +Inf. """
+        total, results = 0, []
+        for bound, count in zip(self.bounds + (float("inf"),), self.buckets):
+            total += count
+            results.append((bound, total))
+        return results
+
+
+class MemorySink(object):
+    """ Keeps a latency histogram for every timing and a running total for every counter, per
+        name and set of tags. """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.timings = {}
+        self.counters = {}
+
+    def timing(self, name, seconds, tags):
+        key = (name, tag_key(tags))
+        with self.lock:
+            histogram = self.timings.get(key)
+            if histogram is None:
+                histogram = self.timings[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def count(self, name, value, tags):
+        key = (name, tag_key(tags))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name, **tags):
+        """ The total of a counter, summed over every tag set matching `tags`. """
+        return sum(value for (key, key_tags), value in self.counters.items()
+                   if key == name and set(tags.iteritems()) <= set(key_tags))
+
+    def histogram(self, name, **tags):
+        """ The histogram of a timing for exactly `tags`, or None. """
+        return self.timings.get((name, tag_key(tags)))
+
+
+class PrometheusSink(MemorySink):
+    """ A MemorySink which renders what it holds in the Prometheus text exposition format, for
+        serving from a /metrics endpoint. request.latency becomes the histogram
+        boompy_request_latency_seconds and request.retries the counter boompy_request_retries_total. """
+
+    def __init__(self, namespace="boompy", buckets=DEFAULT_BUCKETS):
+        self.namespace = namespace
+        super(PrometheusSink, self).__init__(buckets)
+
+    def metric_name(self, name, suffix):
+        return "%s_%s_%s" % (self.namespace, name.replace(".", "_"), suffix)
+
+    def labels(self, tags, **extra):
+        pairs = list(tags) + sorted(extra.items())
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                                 for k, v in pairs)
+
+    def render(self):
+        with self.lock:
+            timings = sorted(self.timings.items())
+            counters = sorted(self.counters.items())
+
+        lines = []
+        typed = set()
+        for (name, tags), histogram in timings:
+            metric = self.metric_name(name, "seconds")
+            if metric not in typed:
+                typed.add(metric)
+                lines.append("# TYPE %s histogram" % metric)
+            for bound, total in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("%s_bucket%s %d" % (metric, self.labels(tags, le=le), total))
+            lines.append("%s_sum%s %r" % (metric, self.labels(tags), histogram.sum))
+            lines.append("%s_count%s %d" % (metric, self.labels(tags), histogram.count))
+
+        for (name, tags), value in counters:
+            metric = self.metric_name(name, "total")
+            if metric not in typed:
+                typed.add(metric)
+                lines.append("# TYPE %s counter" % metric)
+            lines.append("%s%s %r" % (metric, self.labels(tags), value))
+
+        return "\n".join(lines) + "\n"
+
+
+class LoggingSink(object):
+    """ Logs every measurement, at debug level by default. """
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger("boompy.metrics")
+        self.level = level
+
+    def timing(self, name, seconds, tags):
+        self.logger.log(self.level, "%s %.6fs %s", name, seconds, tags)
+
+    def count(self, name, value, tags):
+        self.logger.log(self.level, "%s +%s %s", name, value, tags)
+
+
+class StatsDSink(object):
+    """ Sends every measurement to a StatsD daemon over UDP, with tags in the DogStatsD format.
+        Timings are sent in milliseconds. Send failures are ignored so metrics never break a
+        request. """
+
+    def __init__(self, host="127.0.0.1", port=8125, prefix="boompy"):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def format(self, name, value, kind, tags):
+        line = "%s.%s:%s|%s" % (self.prefix, name, value, kind)
+        if tags:
+            line += "|#" + ",".join("%s:%s" % pair for pair in sorted(tags.iteritems()))
+        return line
+
+    def send(self, line):
+        try:
+            self.socket.sendto(line, self.address)
+        except socket.error:
+            pass
+
+    def timing(self, name, seconds, tags):
+        self.send(self.format(name, "%.3f" % (seconds * 1000), "ms", tags))
+
+    def count(self, name, value, tags):
+        self.send(self.format(name, value, "c", tags))
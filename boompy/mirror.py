@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import threading
+
+from datetime import datetime
+
+from .base_api import API
+from .dates import format_datetime
+from .errors import InterfaceError
+
+# How each QueryFilter operator is compiled to SQL; the value is the SQL template and the number of
+# arguments it takes.
+SQL_OPERATORS = {
+    "EQUALS": ("%s = ?", 1),
+    "NOT_EQUALS": ("%s != ?", 1),
+    "LIKE": ("%s LIKE ?", 1),
+    "GREATER_THAN": ("%s > ?", 1),
+    "GREATER_THAN_OR_EQUAL": ("%s >= ?", 1),
+    "LESS_THAN": ("%s < ?", 1),
+    "LESS_THAN_OR_EQUAL": ("%s <= ?", 1),
+    "STARTS_WITH": ("substr(%s, 1, length(?)) = ?", 1),
+    "IS_NULL": ("%s IS NULL", 0),
+    "IS_NOT_NULL": ("%s IS NOT NULL", 0),
+    "BETWEEN": ("%s BETWEEN ? AND ?", 2),
+}
+
+def quote(name):
+    return '"%s"' % name.replace('"', '""')
+
+def column_value(value):
+    """ How a value is stored in its column: dates as boomi timestamps (which sort correctly) and
+        nested objects as json. """
+    if isinstance(value, datetime):
+        return format_datetime(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+class Mirror(object):
+    """ A local SQLite copy of selected resource types, which can be queried with the same field__op
+        kwargs as Resource.query without going to boomi. Rows are kept per account and partner
+        account, and reads only see rows synced for the current one. """
+
+    def __init__(self, path=":memory:"):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # Tables synced by an earlier Mirror on the same database can be queried straight away.
+        self.tables = set(row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"))
+
+    def scope(self):
+        api = API()
+        return "%s:%s" % (api.account_id, api.partner_account or "")
+
+    def __ensure_table(self, resource):
+        if resource._name in self.tables:
+            return
+
+        table = quote(resource._name)
+        columns = ", ".join(quote(attr) for attr in resource._attributes)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS %s (_scope TEXT NOT NULL, _payload TEXT NOT "
+                          "NULL, %s, PRIMARY KEY (_scope, %s))"
+                          % (table, columns, quote(resource._id_attr)))
+        # Index every reference to another entity (atomId, environmentId, processId...).
+        for attr in resource._attributes:
+            if attr != resource._id_attr and attr.lower().endswith("id"):
+                self.conn.execute("CREATE INDEX IF NOT EXISTS %s ON %s (_scope, %s)"
+                                  % (quote("%s_%s" % (resource._name, attr)), table, quote(attr)))
+        self.tables.add(resource._name)
+
+    def sync(self, resource, **kwargs):
+        """ Replaces the mirrored rows of `resource` for the current account with the results of
+            resource.query(**kwargs). Returns the number of rows mirrored. """
+        entities = list(resource.query(refresh=True, **kwargs))
+        scope = self.scope()
+
+        rows = []
+        for entity in entities:
+            payload = entity.serialize()
+            rows.append([scope, json.dumps(payload)] +
+                        [column_value(payload.get(attr)) for attr in resource._attributes])
+
+        with self.lock, self.conn:
+            self.__ensure_table(resource)
+            table = quote(resource._name)
+            self.conn.execute("DELETE FROM %s WHERE _scope = ?" % table, (scope,))
+            self.conn.executemany("INSERT OR REPLACE INTO %s VALUES (%s)"
+                                  % (table, ", ".join("?" * (len(resource._attributes) + 2))), rows)
+
+        return len(rows)
+
+    def query(self, resource, join="and", **kwargs):
+        """ Returns the mirrored entities of `resource` matching the query kwargs, which work the
+            same way as they do for Resource.query. """
+        q = resource._query_filter(join, **kwargs)
+        where, params = "_scope = ?", [self.scope()]
+
+        expression = q.get("QueryFilter", {}).get("expression")
+        if expression:
+            sql, expression_params = self.__compile(resource, expression)
+            where = "%s AND %s" % (where, sql)
+            params.extend(expression_params)
+
+        with self.lock:
+            if resource._name not in self.tables:
+                return []
+            rows = self.conn.execute("SELECT _payload FROM %s WHERE %s"
+                                     % (quote(resource._name), where), params).fetchall()
+
+        results = []
+        for row in rows:
+            entity = resource()
+            entity._update_attrs_from_response(json.loads(row[0]), scrubbed=True)
+            results.append(entity)
+        return results
+
+    def get(self, resource, boomi_id):
+        """ Returns the mirrored entity with the id `boomi_id`, or None. """
+        results = self.query(resource, **{resource._id_attr: boomi_id})
+        return results[0] if results else None
+
+    def __compile(self, resource, expression):
+        """ Compiles a QueryFilter expression to a SQL condition and its parameters. """
+        if "nestedExpression" in expression:
+            parts, params = [], []
+            for nested in expression["nestedExpression"]:
+                sql, nested_params = self.__compile(resource, nested)
+                parts.append(sql)
+                params.extend(nested_params)
+            joiner = " OR " if expression["operator"].lower() == "or" else " AND "
+            return "(%s)" % joiner.join(parts), params
+
+        prop = expression["property"]
+        if prop not in resource._attributes:
+            raise InterfaceError(prop)
+
+        template, arity = SQL_OPERATORS[expression["operator"]]
+        arguments = [column_value(argument) for argument in expression.get("argument", [])]
+        column = quote(prop)
+
+        if expression["operator"] == "STARTS_WITH":
+            return template % column, arguments[:1] * 2
+        if expression["operator"] == "EQUALS" and len(arguments) > 1:
+            return "%s IN (%s)" % (column, ", ".join("?" * len(arguments))), arguments
+        return template % column, arguments[:arity]
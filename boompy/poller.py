@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import sys
+import threading
+import time
+
+from multiprocessing import TimeoutError
+
+from .base_api import bind_context
+from .errors import BoomiError
+
+class CancelledError(BoomiError):
+    """ Raised by Future.get() for a job which was cancelled. """
+    pass
+
+
+class Future(object):
+    """ The eventual result of a job running in the background. Has the same interface as the
+        AsyncResult returned by the *_async methods, plus cancel(). """
+
+    def __init__(self):
+        self.__done = threading.Event()
+        self.__lock = threading.Lock()
+        self.__callbacks = []
+        self.value = None
+        self.exc_info = None
+
+    def ready(self):
+        return self.__done.is_set()
+
+    def wait(self, timeout=None):
+        self.__wait(timeout)
+
+    def __wait(self, timeout):
+        """ Event.wait() without a timeout can't be interrupted on Python 2, so an open ended
+            wait is made of short ones to let KeyboardInterrupt through. """
+        if timeout is not None:
+            return self.__done.wait(timeout)
+        while not self.__done.wait(1):
+            pass
+        return True
+
+    def successful(self):
+        if not self.ready():
+            raise ValueError("Future is not ready")
+        return self.exc_info is None
+
+    def get(self, timeout=None):
+        """ Returns the result, or raises the error the job failed with. """
+        if not self.__wait(timeout):
+            raise TimeoutError()
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.value
+
+    def cancel(self):
+        """ Stops the job if it is still running. Returns False if it had already finished. """
+        return self.set_error(CancelledError("cancelled"))
+
+    def add_done_callback(self, fn):
+        """ Calls fn(future) once the job finishes, or right away if it already has. """
+        with self.__lock:
+            if not self.ready():
+                self.__callbacks.append(fn)
+                return
+        fn(self)
+
+    def set_result(self, value):
+        return self.__finish(value, None)
+
+    def set_error(self, error, exc_info=None):
+        return self.__finish(None, exc_info or (type(error), error, None))
+
+    def __finish(self, value, exc_info):
+        with self.__lock:
+            if self.ready():
+                return False
+            self.value = value
+            self.exc_info = exc_info
+            self.__done.set()
+            callbacks, self.__callbacks = self.__callbacks, []
+
+        for fn in callbacks:
+            fn(self)
+        return True
+
+
+class PollJob(object):
+    """ A call to `poll` every `interval` seconds until `check` resolves the future. Intervals grow
+        by `backoff` after every poll up to `max_interval`. """
+
+    def __init__(self, poll, check, future, interval, max_interval, backoff, timeout):
+        self.poll = poll
+        self.check = check
+        self.future = future
+        self.interval = interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.deadline = None if timeout is None else time.time() + timeout
+
+
+class Poller(object):
+    """ A single background thread which polls every in flight job, so waiting on many long
+        running boomi jobs doesn't take a thread each. """
+    __instance = None
+
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super(Poller, cls).__new__(cls)
+            cls.__instance.__setup()
+        return cls.__instance
+
+    def __setup(self):
+        self.jobs = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def __len__(self):
+        with self.condition:
+            return len(self.jobs)
+
+    def watch(self, poll, check, interval=1, max_interval=10, backoff=1.5, timeout=None):
+        """ Calls poll() on the poller thread, first after `interval` seconds, then less and less
+            often. check(future, value) gets each value poll() returns and should resolve the future
+            once the job has finished. The future fails with a BoomiError once `timeout` seconds
+            have passed. poll() runs with the client and sub account the caller is using. """
+        future = Future()
+        job = PollJob(bind_context(poll), check, future, interval, max_interval, backoff, timeout)
+        self.__schedule(job, time.time() + interval)
+        return future
+
+    def __schedule(self, job, when):
+        with self.condition:
+            heapq.heappush(self.jobs, (when, next(self.counter), job))
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.__run)
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+
+    def __next_due(self):
+        """ Blocks until a job is due and returns it, or returns None once there are no jobs. """
+        with self.condition:
+            while True:
+                if not self.jobs:
+                    self.thread = None
+                    return None
+                when, _, job = self.jobs[0]
+                now = time.time()
+                if job.future.ready():
+                    heapq.heappop(self.jobs)
+                elif when <= now:
+                    heapq.heappop(self.jobs)
+                    return job
+                else:
+                    self.condition.wait(when - now)
+
+    def __run(self):
+        while True:
+            job = self.__next_due()
+            if job is None:
+                return
+
+            if job.deadline is not None and time.time() >= job.deadline:
+                job.future.set_error(BoomiError("timed out waiting for boomi job"))
+                continue
+
+            try:
+                job.check(job.future, job.poll())
+            except Exception, e:
+                job.future.set_error(e, sys.exc_info())
+
+            if not job.future.ready():
+                job.interval = min(job.max_interval, job.interval * job.backoff)
+                when = time.time() + job.interval
+                if job.deadline is not None:
+                    when = min(when, job.deadline)
+                self.__schedule(job, when)
@@ -0,0 +1,222 @@
+import re
+
+from .errors import InterfaceError
+
+QUERY_OPERATOR_REGEX = re.compile("^(\w+?)(?:__(eq|not|like|gte?|lte?|starts?_with|null|not_null|between))?$")
+QUERY_OPERATOR_LOOKUP = {
+    "eq": "EQUALS",
+    "not": "NOT_EQUALS",
+    "like": "LIKE",
+    "gt": "GREATER_THAN",
+    "gte": "GREATER_THAN_OR_EQUAL",
+    "lt": "LESS_THAN",
+    "lte": "LESS_THAN_OR_EQUAL",
+    "start_with": "STARTS_WITH",
+    "starts_with": "STARTS_WITH",
+    "null": "IS_NULL",
+    "not_null": "IS_NOT_NULL",
+    "between": "BETWEEN"
+}
+
+# The operator each single argument operator becomes when negated.
+NEGATED_OPERATORS = {
+    "EQUALS": "NOT_EQUALS",
+    "NOT_EQUALS": "EQUALS",
+    "IS_NULL": "IS_NOT_NULL",
+    "IS_NOT_NULL": "IS_NULL",
+    "GREATER_THAN": "LESS_THAN_OR_EQUAL",
+    "GREATER_THAN_OR_EQUAL": "LESS_THAN",
+    "LESS_THAN": "GREATER_THAN_OR_EQUAL",
+    "LESS_THAN_OR_EQUAL": "GREATER_THAN",
+}
+
+# The most arguments sent in one EQUALS expression. Longer lists are split over several queries.
+IN_LIST_LIMIT = 200
+
+def predicate(key, value):
+    """ The QueryFilter expression for one query kwarg, e.g. atomId__not="a1". """
+    operator = "EQUALS"
+    prop, op = QUERY_OPERATOR_REGEX.match(key).groups()
+    if op:
+        operator = QUERY_OPERATOR_LOOKUP[op]
+
+    if not isinstance(value, list):
+        value = [value]
+
+    return {"argument": value, "operator": operator, "property": prop}
+
+def query_filter(expression):
+    """ The body of a query request for `expression`. """
+    if expression:
+        return {"QueryFilter": {"expression": expression}}
+    return {}
+
+def group(operator, expressions):
+    if len(expressions) == 1:
+        return expressions[0]
+    return {"operator": operator, "nestedExpression": expressions}
+
+def negate(expression):
+    """ The expression matching exactly what `expression` doesn't. Boomi has no NOT, so negations
+        are pushed down to the predicates (De Morgan) and each predicate's operator flipped. """
+    if "nestedExpression" in expression:
+        operator = "or" if expression["operator"].lower() == "and" else "and"
+        return group(operator, [negate(e) for e in expression["nestedExpression"]])
+
+    prop, operator = expression["property"], expression["operator"]
+    argument = expression.get("argument", [])
+
+    if operator == "BETWEEN":
+        return group("or", [{"argument": argument[:1], "operator": "LESS_THAN", "property": prop},
+                            {"argument": argument[1:], "operator": "GREATER_THAN",
+                             "property": prop}])
+    if operator not in NEGATED_OPERATORS:
+        raise InterfaceError("Negating %s" % operator)
+    if operator == "EQUALS" and len(argument) > 1:
+        return group("and", [{"argument": [value], "operator": "NOT_EQUALS", "property": prop}
+                             for value in argument])
+    return {"argument": argument, "operator": NEGATED_OPERATORS[operator], "property": prop}
+
+def key(expression):
+    """ A hashable key which is the same for expressions which mean the same thing. """
+    if "nestedExpression" in expression:
+        return (expression["operator"].lower(),
+                frozenset(key(e) for e in expression["nestedExpression"]))
+    return (expression["property"], expression["operator"],
+            tuple(expression.get("argument", [])))
+
+def unique(values):
+    seen, results = set(), []
+    for value in values:
+        if value not in seen:
+            seen.add(value)
+            results.append(value)
+    return results
+
+def normalize(expression):
+    """ Flattens nested groups with the same operator, merges EQUALS predicates on the same
+        property within an "or" into one, and drops duplicate predicates and arguments. """
+    if "nestedExpression" not in expression:
+        if expression["operator"] == "EQUALS":
+            return dict(expression, argument=unique(expression.get("argument", [])))
+        return expression
+
+    operator = expression["operator"].lower()
+    children = []
+    for child in (normalize(e) for e in expression["nestedExpression"]):
+        if "nestedExpression" in child and child["operator"].lower() == operator:
+            children.extend(child["nestedExpression"])
+        else:
+            children.append(child)
+
+    if operator == "or":
+        merged, equals = [], {}
+        for child in children:
+            if "nestedExpression" not in child and child["operator"] == "EQUALS":
+                existing = equals.get(child["property"])
+                if existing is not None:
+                    existing["argument"] = unique(existing["argument"] + child["argument"])
+                    continue
+                child = equals[child["property"]] = dict(child, argument=list(child["argument"]))
+            merged.append(child)
+        children = merged
+
+    seen, results = set(), []
+    for child in children:
+        child_key = key(child)
+        if child_key not in seen:
+            seen.add(child_key)
+            results.append(child)
+    return group(operator, results)
+
+def split(expression, limit=IN_LIST_LIMIT):
+    """ Returns expressions which together match what `expression` does, none of which has an
+        EQUALS with more than `limit` arguments. The longest list is cut into chunks and the
+        expression repeated with each chunk in its place, then the rest are split the same way.
+        Negations have already been pushed down to the predicates, so an EQUALS never sits under a
+        NOT and swapping one for a chunk of it only narrows what matches. Results of the pieces
+        can overlap when the expression has an "or", so callers dedupe them. """
+    found = longest_list(expression, limit)
+    if found is None:
+        return [expression]
+
+    path = found[0]
+    leaf = expression
+    for index in path:
+        leaf = leaf["nestedExpression"][index]
+    argument = leaf["argument"]
+
+    results = []
+    for start in range(0, len(argument), limit):
+        piece = replace(expression, path, dict(leaf, argument=argument[start:start + limit]))
+        results.extend(split(piece, limit))
+    return results
+
+def longest_list(expression, limit, path=()):
+    """ (path of nestedExpression indexes, length) of the EQUALS with the most arguments over
+        `limit`, or None. """
+    if "nestedExpression" in expression:
+        found = [longest_list(child, limit, path + (index,))
+                 for index, child in enumerate(expression["nestedExpression"])]
+        found = [f for f in found if f is not None]
+        return max(found, key=lambda f: f[1]) if found else None
+
+    length = len(expression.get("argument", []))
+    if expression["operator"] == "EQUALS" and length > limit:
+        return path, length
+    return None
+
+def replace(expression, path, leaf):
+    if not path:
+        return leaf
+    children = list(expression["nestedExpression"])
+    children[path[0]] = replace(children[path[0]], path[1:], leaf)
+    return dict(expression, nestedExpression=children)
+
+
+class Q(object):
+    """ A query condition built from the same kwargs as Resource.query. Conditions combine with
+        & (and), | (or) and ~ (not) into nested QueryFilter expressions:
+
+        Q(status="ERROR") | (Q(eventLevel="WARNING") & ~Q(atomId=["a1", "a2"]))
+
+        Several kwargs in one Q are joined with "and". """
+
+    def __init__(self, **kwargs):
+        self.operator = "and"
+        self.children = [predicate(k, v) for k, v in kwargs.iteritems() if v is not None]
+        self.negated = False
+
+    def __combine(self, other, operator):
+        if not isinstance(other, Q):
+            return NotImplemented
+        q = Q()
+        q.operator = operator
+        q.children = [self, other]
+        return q
+
+    def __and__(self, other):
+        return self.__combine(other, "and")
+
+    def __or__(self, other):
+        return self.__combine(other, "or")
+
+    def __invert__(self):
+        q = Q()
+        q.operator = self.operator
+        q.children = self.children
+        q.negated = not self.negated
+        return q
+
+    def expression(self):
+        """ The normalized QueryFilter expression for this condition, or None if it has none. """
+        children = [child.expression() if isinstance(child, Q) else child
+                    for child in self.children]
+        children = [child for child in children if child is not None]
+        if not children:
+            return None
+
+        expression = group(self.operator, children)
+        if self.negated:
+            expression = negate(expression)
+        return normalize(expression)
@@ -0,0 +1,178 @@
+import random
+import threading
+import time
+
+from email.utils import parsedate_tz, mktime_tz
+
+# Boomi allows roughly 10 requests per second per account.
+DEFAULT_RATE = 10
+
+# Methods which are safe to send again after boomi tells us to back off. Boomi uses POST for
+# queries and bulk gets, so those urls are treated as reads too.
+IDEMPOTENT_METHODS = ("get", "put", "delete")
+IDEMPOTENT_URL_SUFFIXES = ("/query", "/queryMore", "/bulk")
+
+def retry_after_seconds(res):
+    """ Returns the number of seconds boomi asked us to wait in the Retry-After header, if any. """
+    headers = getattr(res, "headers", None)
+    if not headers:
+        return None
+
+    try:
+        value = headers.get("Retry-After")
+    except AttributeError:
+        return None
+
+    if not isinstance(value, basestring):
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    # Retry-After can also be an http date.
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - time.time())
+
+
+class TokenBucket(object):
+    """ A token bucket whose refill rate adapts to boomi pushing back (AIMD). Every 429/503 halves
+        the rate, and the rate climbs back towards max_rate by `increase` requests per second for
+        every second without being throttled. """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None, min_rate=0.5, increase=1.0, decrease=0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = self.capacity
+        self.updated = time.time()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def __refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.rate = min(self.max_rate, self.rate + self.increase * elapsed)
+        self.tokens = min(self.capacity, self.tokens + self.rate * elapsed)
+
+    def acquire(self):
+        """ Blocks until a request may be sent. Returns the number of seconds spent waiting. """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.time()
+                self.__refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
+
+    def throttle(self, retry_after=None):
+        """ Called when boomi rate limited a request. """
+        with self.lock:
+            now = time.time()
+            self.__refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+class RetryPolicy(object):
+    """ Jittered exponential backoff for idempotent requests which were rate limited. """
+
+    def __init__(self, max_retries=3, base_delay=.25, max_delay=30):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, method, url):
+        return method in IDEMPOTENT_METHODS or url.split("?")[0].endswith(IDEMPOTENT_URL_SUFFIXES)
+
+    def delay(self, attempt, retry_after=None):
+        """ Seconds to wait before retry number `attempt` (starting at 0). """
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class RateLimiter(object):
+    """ Throttles requests to boomi with one token bucket per (account, partner account) pair.
+
+        `accounts` maps an account id to a (rate, burst) tuple for accounts which should not use
+        the default rate. A partner account's limit takes priority over the parent account's. """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None, accounts=None, retry=None):
+        self.rate = rate
+        self.burst = burst
+        self.accounts = accounts or {}
+        self.retry = RetryPolicy() if retry is None else retry
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.counters = {
+            "requests": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "throttled_seconds": 0.0,
+            "backoff_seconds": 0.0,
+        }
+
+    def stats(self):
+        """ Returns a copy of the counters. throttled_seconds is time spent waiting on the token
+            bucket, backoff_seconds is time spent sleeping before retrying a rate limited call. """
+        with self.lock:
+            return dict(self.counters)
+
+    def __count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def reset(self, key):
+        """ Forget the adapted rate for `key`. """
+        with self.lock:
+            self.buckets.pop(key, None)
+
+    def bucket(self, key):
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                account_id, partner_account = key
+                rate, burst = self.accounts.get(partner_account) or \
+                    self.accounts.get(account_id) or (self.rate, self.burst)
+                bucket = self.buckets[key] = TokenBucket(rate, burst)
+            return bucket
+
+    def acquire(self, key):
+        """ Blocks until a request for `key` may be sent. Returns the seconds spent waiting. """
+        waited = self.bucket(key).acquire()
+        self.__count("requests")
+        if waited:
+            self.__count("throttled_seconds", waited)
+        return waited
+
+    def rate_limited(self, key, retry_after=None):
+        self.__count("rate_limited")
+        self.bucket(key).throttle(retry_after)
+
+    def backoff(self, attempt, retry_after=None):
+        """ Sleeps before retry number `attempt`. Returns the number of seconds slept. """
+        delay = self.retry.delay(attempt, retry_after)
+        self.__count("retries")
+        self.__count("backoff_seconds", delay)
+        time.sleep(delay)
+        return delay
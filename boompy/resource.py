@@ -1,12 +1,26 @@
 import copy
-import json
-import re
+import functools
+import marshal
+import sys
+import threading
 import time
 
+from collections import namedtuple
+from types import MemberDescriptorType
+from Queue import Queue, Full
+
 from datetime import datetime
 
-from .errors import APIMethodNotAllowedError, BoomiError
-from .base_api import API
+from .errors import APIMethodNotAllowedError, BoomiError, BulkItemError, InterfaceError
+from .base_api import API, bind_context
+from .async_api import AsyncAPI
+from .batch import BatchResult
+from .fan_out import FanOut
+from .dates import parse_datetime, format_datetime
+from .columns import ColumnBuilder, numpy
+from .metrics import counted
+from .json_stream import RawJSON, iter_query_results, loads, response_chunks
+from .query import Q, query_filter, split
 
 DEFAULT_SUPPORTED = {
     "get": True,
@@ -14,23 +28,43 @@ DEFAULT_SUPPORTED = {
     "put": True,
     "post": True,
     "delete": True,
+    "bulk": False,
 }
 
-QUERY_OPERATOR_REGEX = re.compile("^(\w+?)(?:__(eq|not|like|gte?|lte?|starts?_with|null|not_null|between))?$")
-QUERY_OPERATOR_LOOKUP = {
-    "eq": "EQUALS",
-    "not": "NOT_EQUALS",
-    "like": "LIKE",
-    "gt": "GREATER_THAN",
-    "gte": "GREATER_THAN_OR_EQUAL",
-    "lt": "LESS_THAN",
-    "lte": "LESS_THAN_OR_EQUAL",
-    "start_with": "STARTS_WITH",
-    "starts_with": "STARTS_WITH",
-    "null": "IS_NULL",
-    "not_null": "IS_NOT_NULL",
-    "between": "BETWEEN"
-}
+# The most ids boomi accepts in one bulk request.
+BULK_LIMIT = 100
+
+# Rows in a full page of query results. A shorter page is the last one.
+QUERY_PAGE_SIZE = 100
+
+# Placed on the prefetch queue once the last page has been fetched.
+_END_OF_RESULTS = object()
+
+def freeze(value):
+    """ A copy of a loaded attribute value which later changes to the value can't reach. """
+    if isinstance(value, (dict, list)):
+        return Frozen(value)
+    return value
+
+def unchanged(frozen, value):
+    if isinstance(frozen, RawJSON):
+        return value is frozen or value == frozen.decode()
+    if isinstance(frozen, Frozen):
+        return value == frozen.thaw()
+    return value == frozen
+
+
+class Frozen(object):
+    """ A nested object or list as it was loaded, kept marshalled. marshal is several times faster
+        than json or a deepcopy, which matters since every row of a query is frozen. """
+    __slots__ = ("data",)
+
+    def __init__(self, value):
+        self.data = marshal.dumps(value)
+
+    def thaw(self):
+        return marshal.loads(self.data)
+
 
 class ResourceList(list):
     """ Used to handle lazy loading and paging through results from boomi.
@@ -42,57 +76,376 @@ class ResourceList(list):
         while list_:
             for x in list.__iter__(list_):
                 yield x
-            list_ = list_.__next_page()
+
+            metrics = API().metrics
+            start = time.time()
+            try:
+                list_ = list_.__next_page()
+            finally:
+                if metrics is not None:
+                    metrics.timing("paging.wait", time.time() - start, resource=self.resource._name)
 
     def __len__(self):
         return self.result_count
 
+    def prefetch(self, depth=2, max_rows=None):
+        """ Iterates over all of the results like __iter__, but fetches the next `depth` pages on a
+            background thread while the current page is consumed. At most `depth` pages (or
+            `max_rows` rows, whichever is smaller) are buffered, but never less than one page,
+            since pages are fetched whole; with max_rows below the page size one page is
+            buffered. Once the buffer is full the background thread waits for the consumer to
+            catch up. """
+        page_size = max(self.__actual_len(), 1)
+        if max_rows is not None:
+            depth = min(depth, max(1, max_rows // page_size))
+
+        pages = Queue(maxsize=depth)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def fetch_pages():
+            page = self
+            try:
+                while True:
+                    page = page.__next_page()
+                    if not put(page):
+                        return
+            except StopIteration:
+                put(_END_OF_RESULTS)
+            except Exception:
+                put(sys.exc_info())
+
+        fetcher = threading.Thread(target=bind_context(fetch_pages))
+        fetcher.daemon = True
+        fetcher.start()
+
+        try:
+            for x in list.__iter__(self):
+                yield x
+
+            metrics = API().metrics
+            while True:
+                start = time.time()
+                page = pages.get()
+                if metrics is not None:
+                    metrics.timing("paging.wait", time.time() - start, resource=self.resource._name)
+                if page is _END_OF_RESULTS:
+                    return
+                if isinstance(page, tuple):
+                    raise page[0], page[1], page[2]
+                for x in list.__iter__(page):
+                    yield x
+        finally:
+            stop.set()
+
     def __actual_len(self):
         return super(ResourceList, self).__len__()
 
     def __next_page(self):
-        time.sleep(.2)
-        if not self.query_token or self.__actual_len() < 100:
+        res = self.__query_more(self.resource, self.query_token, self.__actual_len())
+        return ResourceList.page_for_response(self.resource, res, **self.options)
+
+    @staticmethod
+    def __query_more(resource, query_token, page_len):
+        # Throttling between pages is handled by the rate limiter on the API singleton.
+        if not query_token or page_len < QUERY_PAGE_SIZE:
             raise StopIteration
 
-        res = self.resource._https_request("%s/queryMore" % self.resource._base_url(),
-                                           method="post", data=self.query_token)
+        return resource._https_request("%s/queryMore" % resource._base_url(),
+                                       method="post", data=query_token, stream=True)
+
+    def __iter_remaining_payloads(self):
+        """ Yields the undecoded payload of every result on the pages after this one. """
+        query_token, page_len = self.query_token, self.__actual_len()
+        while True:
+            try:
+                res = self.__query_more(self.resource, query_token, page_len)
+            except StopIteration:
+                return
+
+            meta = {}
+            page_len = 0
+            try:
+                for payload in iter_query_results(response_chunks(res), meta):
+                    page_len += 1
+                    yield payload
+            finally:
+                res.close()
+            query_token = meta.get("queryToken")
+
+    def __build_columns(self):
+        builder = ColumnBuilder(self.resource)
+        for row in list.__iter__(self):
+            builder.append([getattr(row, attr) for attr in self.resource._attributes])
+        fields = self.options.get("fields")
+        for payload in self.__iter_remaining_payloads():
+            if fields is None:
+                builder.append(self.resource._decode_attrs(payload, scrubbed=True))
+            else:
+                builder.append(self.resource._decode_record(payload, fields))
+        return builder
+
+    def to_columns(self):
+        """ Returns every result as a dict of attribute name to a list of values. The pages after
+            this one are decoded straight into the columns without building an entity per row. """
+        return self.__build_columns().to_columns()
+
+    def to_arrays(self):
+        """ Like to_columns(), but each column is a numpy array: numbers are int64 or float64, dates
+            are datetime64 and strings are dictionary encoded into a DictionaryArray. """
+        if numpy is None:
+            raise BoomiError("numpy is required for to_arrays()")
+        return self.__build_columns().to_arrays()
 
-        return ResourceList.page_for_response(self.resource, res)
+    @classmethod
+    def iter_response(cls, resource, response, meta, records=False, lazy=False, fields=None):
+        """ Yields an entity for each result in a query page as soon as it has been decoded. The
+            other top level values of the page (queryToken, numberOfResults) are put in `meta`.
+            With records=True, rows are returned as resource.Record tuples instead. With
+            lazy=True, the resource's nested attributes are only decoded when first read. With
+            fields, only those attributes are set. """
+        lazy_keys = resource._nested_attributes if lazy and not records else None
+        resource._field_plan(fields)
+        metrics = API().metrics
+        timed = metrics is not None
+        decode = materialize = 0.0
+        rows = 0
+        size = [0]
+        chunks = response_chunks(response)
+        if timed:
+            chunks = counted(chunks, size)
+
+        try:
+            start = time.time() if timed else 0
+            for payload in iter_query_results(chunks, meta, lazy_keys):
+                if timed:
+                    # Decode time includes waiting on boomi, since the page is read as it arrives.
+                    built = time.time()
+                    decode += built - start
+
+                if records:
+                    row = resource._decode_record(payload, fields)
+                else:
+                    row = resource()
+                    row._update_attrs_from_response(payload, scrubbed=True, fields=fields)
+
+                if timed:
+                    materialize += time.time() - built
+                    rows += 1
+                yield row
+                if timed:
+                    start = time.time()
+        finally:
+            response.close()
+            if timed:
+                metrics.timing("page.decode", decode, resource=resource._name)
+                metrics.timing("page.materialize", materialize, resource=resource._name)
+                metrics.count("page.rows", rows, resource=resource._name)
+                metrics.count("page.bytes", size[0], resource=resource._name)
 
     @classmethod
-    def __process_obj_results(cls, resource, result_objs):
-        response = []
-        for payload in result_objs:
-            entity = resource()
-            response.append(entity)
-            entity._update_attrs_from_response(payload)
+    def from_rows(cls, resource, rows, **options):
+        """ Returns a list holding `rows` which has no further pages to fetch. """
+        list_ = cls(rows)
+        list_.resource = resource
+        list_.options = options
+        list_.result_count = len(rows)
+        list_.query_token = None
 
-        return response
+        return list_
 
     @classmethod
-    def page_for_response(cls, resource, response):
-        query_result = json.loads(response.content)
-        result_objs = cls.__process_obj_results(resource, query_result.get("result", []))
-        list_ = cls(result_objs)
+    def page_for_response(cls, resource, response, **options):
+        meta = {}
+        list_ = cls(cls.iter_response(resource, response, meta, **options))
         list_.resource = resource
-        list_.result_count = query_result.get("numberOfResults", len(result_objs))
-        list_.query_token = query_result.get("queryToken")
+        list_.options = options
+        list_.result_count = meta.get("numberOfResults", list_.__actual_len())
+        list_.query_token = meta.get("queryToken")
 
         return list_
 
 
-# A meta class that fakes the name of the class generated via the factory
+class QueryCursor(object):
+    """ Streams the results of a query. Pages are fetched as they are needed and each row is decoded
+        as it arrives, so memory use stays the same however many results there are.
+
+        query_token and page_offset say where the cursor is: the token of the page holding the next
+        row (None for the first page) and how many rows of that page have been yielded. Saving
+        them and passing them to Resource.iter_query later picks up where the cursor stopped.
+
+        Indexes and slices count from where the cursor started, independent of iteration. Pages
+        before the first row wanted are scanned without being decoded, and no pages after the last
+        row wanted are fetched. """
+
+    def __init__(self, resource, q, query_token=None, page_offset=0, **options):
+        self.resource = resource
+        self.q = q
+        self.options = options
+        self.start = (query_token, page_offset)
+        self.query_token = query_token
+        self.page_offset = page_offset
+        self.total = None
+        self.done = False
+
+    def __fetch(self, query_token):
+        if query_token is None:
+            return self.resource._https_request("%s/query" % self.resource._base_url(),
+                                                method="post", data=self.q, stream=True)
+        return self.resource._https_request("%s/queryMore" % self.resource._base_url(),
+                                            method="post", data=query_token, stream=True)
+
+    def __iter__(self):
+        while not self.done:
+            meta = {}
+            page_len = 0
+            rows = ResourceList.iter_response(self.resource, self.__fetch(self.query_token), meta,
+                                              **self.options)
+            try:
+                for row in rows:
+                    page_len += 1
+                    if page_len <= self.page_offset:
+                        continue
+                    self.page_offset = page_len
+                    yield row
+            finally:
+                rows.close()
+
+            self.total = meta.get("numberOfResults", self.total)
+            if not meta.get("queryToken") or page_len < QUERY_PAGE_SIZE:
+                self.done = True
+            else:
+                self.query_token = meta["queryToken"]
+                self.page_offset = 0
+
+    def __rows(self, start, stop):
+        """ Yields (index, row) for the rows from `start` up to `stop` (None for all of them). """
+        query_token, skip = self.start
+        lazy_keys = self.resource._nested_attributes if self.options.get("lazy") else None
+        records = self.options.get("records")
+        fields = self.options.get("fields")
+        index = 0
+
+        while True:
+            meta = {}
+            page_len = 0
+            res = self.__fetch(query_token)
+            try:
+                for raw in iter_query_results(response_chunks(res), meta, raw=True):
+                    page_len += 1
+                    if page_len <= skip:
+                        continue
+                    if stop is not None and index >= stop:
+                        return
+                    if index >= start:
+                        payload = loads(raw.text, lazy_keys)
+                        if records:
+                            yield index, self.resource._decode_record(payload, fields)
+                        else:
+                            entity = self.resource()
+                            entity._update_attrs_from_response(payload, scrubbed=True,
+                                                               fields=fields)
+                            yield index, entity
+                    index += 1
+            finally:
+                res.close()
+
+            query_token, skip = meta.get("queryToken"), 0
+            if not query_token or page_len < QUERY_PAGE_SIZE:
+                return
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.start or 0, index.stop, index.step or 1
+            if start < 0 or (stop is not None and stop < 0) or step < 1:
+                raise ValueError("QueryCursor only supports slices counting forward from 0")
+            return [row for i, row in self.__rows(start, stop) if (i - start) % step == 0]
+
+        if index < 0:
+            raise ValueError("QueryCursor does not support negative indexes")
+        for _, row in self.__rows(index, index + 1):
+            return row
+        raise IndexError("QueryCursor index out of range")
+
+
+class LazyAttribute(object):
+    """ Wraps the slot of a nested attribute so RawJSON left there by a lazy load is decoded the
+        first time the attribute is read. """
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, obj, type_=None):
+        if obj is None:
+            return self
+        value = self.slot.__get__(obj, type_)
+        if isinstance(value, RawJSON):
+            value = value.decode()
+            self.slot.__set__(obj, value)
+        return value
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+    def __delete__(self, obj):
+        self.slot.__delete__(obj)
+
+
+# A meta class that fakes the name of the class generated via the factory, and gives every resource
+# class a slot per attribute so instances don't carry a __dict__ around.
 class ResourceMeta(type):
     def __new__(cls, name, parents, dict_):
         name = dict_.get('_name', name)
-        return super(ResourceMeta, cls).__new__(cls, name, parents, dict_)
+
+        if "__slots__" not in dict_:
+            inherited = set()
+            for parent in parents:
+                for klass in parent.__mro__:
+                    inherited.update(getattr(klass, "__slots__", ()))
+            attributes = dict_.get("_attributes") or getattr(parents[0], "_attributes", ())
+            dict_["__slots__"] = tuple(attr for attr in attributes if attr not in inherited)
+
+        resource = super(ResourceMeta, cls).__new__(cls, name, parents, dict_)
+
+        # Which attributes hold timestamps is worked out once here rather than on every row.
+        resource._decode_plan = tuple((attr, "Date" in attr or "Time" in attr)
+                                      for attr in resource._attributes)
+        resource._field_plans = {}
+        # Only types which can be updated keep a snapshot of what was loaded.
+        resource._tracks_changes = bool(resource.supported.get("put"))
+
+        for attr in resource._nested_attributes:
+            slot = resource.__dict__.get(attr)
+            if isinstance(slot, MemberDescriptorType):
+                setattr(resource, attr, LazyAttribute(slot))
+
+        # A read only, tuple backed version of the resource for holding lots of rows in memory.
+        resource.Record = namedtuple("%sRecord" % name, resource._attributes)
+        resource.Record.__new__.__defaults__ = (None,) * len(resource._attributes)
+        return resource
 
 class Resource(object):
     """ A base boomi resource. """
+    __metaclass__ = ResourceMeta
+    # The attribute values as last loaded from boomi, frozen, for telling what has changed since.
+    __slots__ = ("_snapshot",)
 
     _id_attr = None
     _attributes = tuple()
+    # Attributes holding nested objects (extensions, schedules, ...) which may be decoded lazily.
+    _nested_attributes = tuple()
+    # Attributes boomi needs on every update, on top of the id, even when they haven't changed.
+    _required_attributes = tuple()
+    # Extra fields which tell boomi an update only holds some attributes, for types which have them.
+    _partial_fields = {}
     _name = "Resource"
     _uri = None
 
@@ -104,17 +457,36 @@ class Resource(object):
         return cls.name
 
     def __init__(self, **kwargs):
-        for attr in self._attributes:
-            setattr(self, attr, None)
-
         # Go through the kwargs and if they are an attribute we expect, assigns the value to self.
         for key, value in kwargs.iteritems():
             if key in self._attributes:
                 setattr(self, key, value)
 
+    def __getattr__(self, attr):
+        # Only called for attributes which have not been set; unset attributes read as None.
+        if attr in self._attributes:
+            return None
+        raise AttributeError("'%s' object has no attribute '%s'" % (self._name, attr))
+
+    def __getstate__(self):
+        state = dict((attr, getattr(self, attr)) for attr in self._attributes)
+        snapshot = getattr(self, "_snapshot", None)
+        if snapshot is not None:
+            state["_snapshot"] = snapshot
+        return state
+
+    def __setstate__(self, state):
+        for attr, value in state.iteritems():
+            setattr(self, attr, value)
+
+    def to_record(self):
+        """ Returns self as a read only Record tuple. """
+        return self.Record._make(getattr(self, attr) for attr in self._attributes)
+
 
     @classmethod
-    def create_resource(cls, type_, attributes, id_attr="id", **supported_methods):
+    def create_resource(cls, type_, attributes, id_attr="id", nested=(), required=(),
+                        partial=None, **supported_methods):
         """ Factory function which will return a class of type 'type_' """
 
         _supported = copy.copy(DEFAULT_SUPPORTED)
@@ -126,19 +498,24 @@ class Resource(object):
             _name = type_
             _id_attr = id_attr
             _attributes = attributes
+            _nested_attributes = nested
+            _required_attributes = required
+            _partial_fields = partial or {}
             supported = _supported
 
         return SubResource
 
 
     @classmethod
-    def _https_request(cls, url, method="get", data=None):
+    def _https_request(cls, url, method="get", data=None, stream=False):
         """ Validate that we can call this method, and then calls it on the API singleton """
         actual_method = method
 
         # Make sure we're checking capabilities againts real permissions, despite Boomi's silly rest
         # api using POST for everything.
-        if "update" in url:
+        if url.endswith("/bulk"):
+            actual_method = "bulk"
+        elif "update" in url:
             actual_method = "put"
         elif "query" in url:
             actual_method = "query"
@@ -149,15 +526,103 @@ class Resource(object):
         if data is None:
             data = {}
 
-        return API().https_request(url, method, data)
+        return API().https_request(url, method, data, stream=stream)
 
 
-    def _update_attrs_from_response(self, payload):
-        """ Updates the attributes on self from the response object.
+    def _update_attrs_from_response(self, payload, scrubbed=False, fields=None):
+        """ Updates the attributes on self from the response object, or only `fields` of them.
             We expect that all errors which will get raised will have already been raised. """
+        plan = self._field_plan(fields)
+        values = self._decode_attrs(payload, scrubbed, fields)
+        for (attr, _), value in zip(plan, values):
+            setattr(self, attr, value)
+
+        if self._tracks_changes:
+            if fields is not None:
+                loaded = dict((attr, value) for (attr, _), value in zip(plan, values))
+                values = [loaded.get(attr) for attr in self._attributes]
+            self._snapshot = tuple(freeze(value) for value in values)
+
+
+    def __current(self, attr):
+        """ The value of `attr` without decoding it if it was loaded lazily. """
+        descriptor = getattr(type(self), attr, None)
+        if isinstance(descriptor, LazyAttribute):
+            try:
+                return descriptor.slot.__get__(self, type(self))
+            except AttributeError:
+                return None
+        return getattr(self, attr)
+
+
+    def changes(self):
+        """ Returns the attributes which have changed since self was loaded from boomi, as a dict of
+            attribute name to value. An entity which wasn't loaded from boomi has every attribute
+            which is set. """
+        snapshot = getattr(self, "_snapshot", None)
+        if snapshot is None:
+            return dict((attr, getattr(self, attr)) for attr in self._attributes
+                        if getattr(self, attr) is not None)
+
+        changed = {}
+        for attr, frozen in zip(self._attributes, snapshot):
+            value = self.__current(attr)
+            if not unchanged(frozen, value):
+                changed[attr] = getattr(self, attr)
+        return changed
+
+
+    def is_dirty(self):
+        return bool(self.changes())
+
+
+    def diff(self, other):
+        """ Returns {attribute: (self's value, other's value)} for every attribute set on self
+            which other has a different value for. """
+        drift = {}
         for attr in self._attributes:
+            value = getattr(self, attr)
+            if value is not None and value != getattr(other, attr):
+                drift[attr] = (value, getattr(other, attr))
+        return drift
+
+
+    @classmethod
+    def _field_plan(cls, fields=None):
+        """ The (attribute, is_date) pairs to decode for `fields`, or for every attribute. """
+        if fields is None:
+            return cls._decode_plan
+
+        key = frozenset(fields)
+        plan = cls._field_plans.get(key)
+        if plan is None:
+            unknown = key.difference(cls._attributes)
+            if unknown:
+                raise InterfaceError(", ".join(sorted(unknown)))
+            plan = cls._field_plans[key] = tuple(step for step in cls._decode_plan if step[0] in key)
+        return plan
+
+
+    @classmethod
+    def _decode_record(cls, payload, fields=None):
+        """ Returns a cls.Record from a decoded response object. Attributes missing from `fields`
+            are None. """
+        if fields is None:
+            return cls.Record._make(cls._decode_attrs(payload, scrubbed=True))
+        attrs = [attr for attr, _ in cls._field_plan(fields)]
+        return cls.Record(**dict(zip(attrs, cls._decode_attrs(payload, True, fields))))
+
+
+    @classmethod
+    def _decode_attrs(cls, payload, scrubbed=False, fields=None):
+        """ Returns the decoded value of each of cls._attributes (or of `fields`) from a response
+            object. Payloads decoded by json_stream have had their "@type" keys dropped already
+            (scrubbed=True). Attributes not in `fields` are skipped, dates included, so they cost
+            nothing past the json decode. """
+        values = []
+        for attr, is_date in cls._field_plan(fields):
             value = payload.get(attr)
-            processing = [value]
+            processing = [] if scrubbed else [value]
             while processing:
                 current = processing.pop()
                 if isinstance(current, list):
@@ -166,89 +631,346 @@ class Resource(object):
                     if current.get("@type"):
                         del current["@type"]
                     processing.extend(current.values())
-            if ("Date" in attr or "Time" in attr) and value:
-                value = datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
-            setattr(self, attr, value)
+            if is_date and value:
+                value = parse_datetime(value)
+            values.append(value)
+        return values
 
 
     def _serialize_value(self, value):
         if isinstance(value, datetime):
-            return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+            return format_datetime(value)
         return value
 
 
-    def serialize(self):
-        """ Serialize self for the payload getting sent to boomi. """
-        return {k: self._serialize_value(getattr(self, k)) for k in self._attributes
-                if getattr(self, k) is not None}
+    def serialize(self, attributes=None):
+        """ Serialize self for the payload getting sent to boomi. Only `attributes` are included
+            when it is given, along with any of them which are None. """
+        data = {}
+        for attr in attributes or self._attributes:
+            value = getattr(self, attr)
+            if value is not None:
+                data[attr] = format_datetime(value) if isinstance(value, datetime) else value
+            elif attributes is not None:
+                data[attr] = None
+        return data
 
 
     @classmethod
-    def get(cls, boomi_id):
-        """ Returns a single instance of type cls if the ID passed in here is a valid entity. """
+    def get(cls, boomi_id, lazy=False, fields=None):
+        """ Returns a single instance of type cls if the ID passed in here is a valid entity. With
+            lazy=True, nested attributes are only decoded when first read. With fields, only those
+            attributes are set. If a cache is set on the API singleton, a cached copy is returned
+            when there is one. """
+        cache = None if lazy or fields is not None else API().cache
+        if cache is not None:
+            resource = cache.get(cls, boomi_id)
+            if resource is None:
+                resource = cache.load(cls, boomi_id, lambda: cls._fetch(boomi_id))
+            return resource
+
+        return cls._fetch(boomi_id, lazy=lazy, fields=fields)
 
+    @classmethod
+    def _fetch(cls, boomi_id, lazy=False, fields=None):
+        """ Gets boomi_id from boomi, never from the cache. """
         resource = cls()
         res = cls._https_request(resource.url(boomi_id=boomi_id), method="get")
-        resource._update_attrs_from_response(json.loads(res.content))
-
+        payload = loads(res.content, cls._nested_attributes if lazy else None)
+        resource._update_attrs_from_response(payload, scrubbed=True, fields=fields)
         return resource
 
 
     @classmethod
-    def query(cls, join="and", **kwargs):
+    def get_many(cls, boomi_ids):
+        """ Gets every entity in `boomi_ids`. Types which support it are fetched BULK_LIMIT at a time
+            through boomi's bulk endpoint, everything else with concurrent requests; on a pool
+            worker the requests run one after another instead. Either way the entities come from
+            boomi, never from the cache. Returns a BatchResult in the order of `boomi_ids`, with
+            the error for each id that failed. """
+        boomi_ids = list(boomi_ids)
+        result = BatchResult(len(boomi_ids))
+        pool = AsyncAPI()
+
+        def calls(fn, args):
+            if pool.in_worker():
+                return [functools.partial(fn, arg) for arg in args]
+            return [pool.submit(fn, arg).get for arg in args]
+
+        if cls.supported.get("bulk"):
+            chunks = [range(start, min(start + BULK_LIMIT, len(boomi_ids)))
+                      for start in range(0, len(boomi_ids), BULK_LIMIT)]
+            pending = calls(cls._bulk_get, [[boomi_ids[i] for i in chunk] for chunk in chunks])
+            for chunk, call in zip(chunks, pending):
+                try:
+                    responses = call()
+                except Exception, e:
+                    for index in chunk:
+                        result.fail(index, e)
+                    continue
+                for offset, entity, error in responses:
+                    if error is None:
+                        result.succeed(chunk[offset], entity)
+                    else:
+                        result.fail(chunk[offset], error)
+        else:
+            for index, call in enumerate(calls(cls._fetch, boomi_ids)):
+                try:
+                    result.succeed(index, call())
+                except Exception, e:
+                    result.fail(index, e)
+
+        return result
+
+    @classmethod
+    def _bulk_get(cls, boomi_ids):
+        """ Gets up to BULK_LIMIT entities in one request. Returns (index, entity, error) for each
+            of the ids; exactly one of entity or error is set. """
+        data = {"type": "GET", "request": [{"id": boomi_id} for boomi_id in boomi_ids]}
+        res = cls._https_request("%s/bulk" % cls._base_url(), method="post", data=data)
+
+        responses = {}
+        for item in loads(res.content).get("response", []):
+            index = item.get("index")
+            if not isinstance(index, (int, long)) or not 0 <= index < len(boomi_ids):
+                # Fall back on the id for items without a usable index.
+                index = next((i for i, boomi_id in enumerate(boomi_ids)
+                              if boomi_id == item.get("id") and i not in responses), None)
+                if index is None:
+                    continue
+
+            status_code = item.get("statusCode")
+            if status_code == 200 and item.get("Result") is not None:
+                entity = cls()
+                entity._update_attrs_from_response(item["Result"], scrubbed=True)
+                responses[index] = (index, entity, None)
+            else:
+                error = BulkItemError(boomi_ids[index], status_code, item.get("errorMessage"))
+                responses[index] = (index, None, error)
+
+        for index, boomi_id in enumerate(boomi_ids):
+            if index not in responses:
+                error = BulkItemError(boomi_id, None, "missing from the bulk response")
+                responses[index] = (index, None, error)
+        return [responses[index] for index in range(len(boomi_ids))]
+
+    @classmethod
+    def get_async(cls, boomi_id):
+        """ Non blocking get(). Returns an AsyncResult whose .get() returns the entity. """
+        return AsyncAPI().submit(cls.get, boomi_id)
+
+
+    @classmethod
+    def query(cls, join="and", records=False, lazy=False, refresh=False, fields=None, **kwargs):
         """ Returns a list of entities of type 'cls' matching the query kwargs passed. If left
-            empty, is the equivilent of all() """
-        expressions = []
+            empty, is the equivilent of all(). `join` may be a Q instead of "and" or "or", which
+            is and-ed with the kwargs. With records=True the results are read only cls.Record
+            tuples, which take less memory than full entities. With lazy=True, nested attributes
+            are only decoded when first read. With fields, only those attributes are set, which
+            saves decoding and memory in proportion to the attributes left out. If a query cache
+            is set on the API singleton, cached results are returned unless refresh=True.
+
+            A list of more than IN_LIST_LIMIT values is split over several queries, which are run
+            concurrently and fully paged; their results are merged without duplicates. """
+        expression = cls._query_expression(join, **kwargs)
+        q = query_filter(expression)
+
+        cache = None if lazy or fields is not None else API().query_cache
+        if cache is not None and not refresh:
+            results = cache.get(cls, q, records=records)
+            if results is not None:
+                return results
+
+        expressions = split(expression) if expression else [expression]
+        if len(expressions) > 1:
+            results = cls._query_split(expressions, records=records, lazy=lazy, fields=fields)
+        else:
+            results = cls._query_page(q, records=records, lazy=lazy, fields=fields)
 
-        for key, value in kwargs.iteritems():
-            if value is not None:
-                operator = "EQUALS"
-                prop, op = QUERY_OPERATOR_REGEX.match(key).groups()
-                if op:
-                    operator = QUERY_OPERATOR_LOOKUP[op]
-
-                if not isinstance(value, list):
-                    value = [value]
-
-                expressions.append({
-                    "argument": value,
-                    "operator": operator,
-                    "property": prop
-                })
-
-        if len(expressions) == 1:
-            expressions = expressions[0]
-        elif len(expressions) > 1:
-            expressions = {
-                "operator": join,
-                "nestedExpression": expressions
-            }
-
-        if expressions:
-            q = {"QueryFilter": {"expression": expressions}}
+        if cache is not None:
+            results = cache.set(cls, q, results, records=records)
+        return results
+
+    @classmethod
+    def _query_page(cls, q, **options):
+        """ Runs the query `q` and returns the first page of its results. """
+        res = cls._https_request("%s/query" % cls._base_url(), method="post", data=q, stream=True)
+        return ResourceList.page_for_response(cls, res, **options)
+
+    @classmethod
+    def _query_split(cls, expressions, records=False, lazy=False, fields=None):
+        """ Runs a query for each of `expressions` concurrently and merges their results, keeping
+            the first row seen for each id. On a pool worker (under query_async, say) the queries
+            run one after another instead, since waiting on the pool from inside it can deadlock. """
+        if fields is not None and cls._id_attr not in fields:
+            fields = tuple(fields) + (cls._id_attr,)
+        options = {"records": records, "lazy": lazy, "fields": fields}
+
+        def run(q):
+            return list(cls._query_page(q, **options))
+
+        pool = AsyncAPI()
+        if pool.in_worker():
+            pages = [run(query_filter(e)) for e in expressions]
         else:
-            q = {}
+            pages = [job.get() for job in [pool.submit(run, query_filter(e)) for e in expressions]]
+
+        seen, rows = set(), []
+        for page in pages:
+            for row in page:
+                boomi_id = getattr(row, cls._id_attr)
+                if boomi_id is None or boomi_id not in seen:
+                    seen.add(boomi_id)
+                    rows.append(row)
+        return ResourceList.from_rows(cls, rows, **options)
+
+    @classmethod
+    def iter_query(cls, join="and", records=False, lazy=False, fields=None, query_token=None,
+                   page_offset=0, **kwargs):
+        """ Like query(), but returns a QueryCursor which streams the results in constant memory.
+            Pass the query_token and page_offset of a cursor which stopped part way through to
+            resume it; the query kwargs are ignored then, since the token carries the query. Long
+            lists of values are sent as they are, since a cursor follows a single query. """
+        return QueryCursor(cls, cls._query_filter(join, **kwargs), query_token=query_token,
+                           page_offset=page_offset, records=records, lazy=lazy, fields=fields)
 
-        # Do the initial query to get the first set of results
-        res = cls._https_request("%s/query" % cls._base_url(), method="post", data=q)
-        return ResourceList.page_for_response(cls, res)
+    @classmethod
+    def _query_expression(cls, join="and", **kwargs):
+        """ The normalized QueryFilter expression for the query kwargs passed, or None. """
+        if isinstance(join, Q):
+            return (join & Q(**kwargs)).expression()
+        q = Q(**kwargs)
+        q.operator = join
+        return q.expression()
 
-    def save(self, **kwargs):
-        """ Updates or creates self on boomi. """
+    @classmethod
+    def _query_filter(cls, join="and", **kwargs):
+        """ Builds the QueryFilter body sent to boomi for the query kwargs passed. """
+        return query_filter(cls._query_expression(join, **kwargs))
+
+    @classmethod
+    def query_async(cls, join="and", **kwargs):
+        """ Non blocking query(). Returns an AsyncResult whose .get() returns the ResourceList. """
+        return AsyncAPI().submit(cls.query, join=join, **kwargs)
+
+    @classmethod
+    def query_accounts(cls, account_ids, join="and", **kwargs):
+        """ Runs the same query in every partner sub account in `account_ids` concurrently.
+            Returns a FanOut which yields (account_id, entity) pairs as the results arrive. """
+        return FanOut(account_ids, cls.query, join=join, **kwargs)
+
+    def save(self, force=False, changed_only=False, **kwargs):
+        """ Updates or creates self on boomi. An entity loaded from boomi is only sent if it has
+            changed since, unless force=True. Boomi's updates replace the whole entity, so every
+            attribute is sent; changed_only=True sends just the changed ones (plus the id,
+            _required_attributes and _partial_fields), which is only safe for types whose updates
+            merge, like EnvironmentExtensions. """
         url = self.url()
+        data = None
 
         if getattr(self, self._id_attr) is not None:
             url = "%s/update" % url
+            if not force and getattr(self, "_snapshot", None) is not None:
+                changed = self.changes()
+                if not changed:
+                    return
+                if changed_only:
+                    data = self.serialize(changed.keys() + [self._id_attr] +
+                                          list(self._required_attributes))
+                    data.update(self._partial_fields)
+
+        if data is None:
+            data = self.serialize()
 
-        res = self._https_request(url, method="post", data=self.serialize())
-        self._update_attrs_from_response(json.loads(res.content))
+        try:
+            res = self._https_request(url, method="post", data=data)
+            self._update_attrs_from_response(loads(res.content), scrubbed=True)
+        finally:
+            self._invalidate_cache()
 
 
     def delete(self, **kwargs):
         if getattr(self, self._id_attr) is None:
             raise BoomiError("Cannot call delete() on object which has not been saved yet.")
 
-        self._https_request(self.url(), method="delete", data=self.serialize())
+        try:
+            self._https_request(self.url(), method="delete", data=self.serialize())
+        finally:
+            self._invalidate_cache()
+
+
+    def _invalidate_cache(self):
+        """ Drops self, and any cached query results for its type, from the caches on the API
+            singleton after a write. """
+        api = API()
+        boomi_id = getattr(self, self._id_attr)
+        if api.cache is not None and boomi_id is not None:
+            api.cache.invalidate(type(self), boomi_id)
+        if api.query_cache is not None:
+            api.query_cache.invalidate(type(self))
+
+
+    @classmethod
+    def diff_many(cls, entities):
+        """ Compares every entity in `entities` with the copy on boomi without writing anything.
+            Returns a BatchResult in the order of `entities` holding each one's diff() against
+            boomi's copy; an empty dict means it matches. """
+        entities = list(entities)
+        result = BatchResult(len(entities))
+        current = cls.get_many([getattr(entity, cls._id_attr) for entity in entities])
+
+        for index, entity in enumerate(entities):
+            if index in current.errors:
+                result.fail(index, current.errors[index])
+            else:
+                result.succeed(index, entity.diff(current[index]))
+        return result
+
+
+    @classmethod
+    def save_many(cls, entities):
+        """ Saves every entity concurrently on the AsyncAPI pool, under the same rate limit as
+            everything else. Returns a BatchResult in the order of `entities`; an entity which
+            could not be saved has its error in .errors instead of stopping the rest. """
+        return cls.__run_many(entities, "save")
+
+
+    @classmethod
+    def delete_many(cls, entities):
+        """ Deletes every entity concurrently. Returns a BatchResult like save_many(). """
+        return cls.__run_many(entities, "delete")
+
+
+    @staticmethod
+    def __run_many(entities, method):
+        """ Calls `method` on every entity on the pool. On a pool worker they are called one after
+            another instead, since waiting on the pool from inside it can deadlock. """
+        entities = list(entities)
+        result = BatchResult(len(entities))
+        pool = AsyncAPI()
+        if pool.in_worker():
+            calls = [getattr(entity, method) for entity in entities]
+        else:
+            calls = [pool.submit(getattr(entity, method)).get for entity in entities]
+
+        for index, call in enumerate(calls):
+            try:
+                call()
+                result.succeed(index, entities[index])
+            except Exception, e:
+                result.fail(index, e)
+
+        return result
+
+
+    def save_async(self, **kwargs):
+        """ Non blocking save(). """
+        return AsyncAPI().submit(self.save, **kwargs)
+
+
+    def delete_async(self, **kwargs):
+        """ Non blocking delete(). """
+        return AsyncAPI().submit(self.delete, **kwargs)
 
 
     @classmethod
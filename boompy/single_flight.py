@@ -0,0 +1,86 @@
+import sys
+import threading
+
+# The url suffixes of POSTs which only read.
+READ_SUFFIXES = ("/query", "/queryMore")
+
+def is_read(url, method):
+    """ Whether a request to boomi only reads, so identical ones at the same time can share it. """
+    return method == "get" or url.split("?")[0].endswith(READ_SUFFIXES)
+
+
+class Call(object):
+    """ A call in flight, and what its followers need once it is done. """
+    __slots__ = ("done", "followers", "result", "exc_info")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """ Lets concurrent identical calls share one execution. The first caller with a key runs the
+        call; callers with the same key who arrive before it finishes wait for it and get the same
+        result, or the same exception. Nothing is kept once the call is done, so a later caller
+        always starts a fresh one. """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.counters = {"calls": 0, "shared": 0}
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats["in_flight"] = len(self.calls)
+        return stats
+
+    def do(self, key, fn, share=None):
+        """ Returns fn(), or the result of the identical call already in flight for `key`. When
+            the result is handed to other callers, it is passed through share() first, e.g. to
+            read a streamed body so every caller can decode it. Returns (result, shared), where
+            shared says whether this caller got another's result. """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = Call()
+                self.counters["calls"] += 1
+                leader = True
+            else:
+                call.followers += 1
+                self.counters["shared"] += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.exc_info is not None:
+                raise call.exc_info[0], call.exc_info[1], call.exc_info[2]
+            return call.result, True
+
+        try:
+            result = fn()
+        except Exception:
+            call.exc_info = sys.exc_info()
+            self.__finish(key)
+            call.done.set()
+            raise
+
+        # Nobody can join once the call is finished, so followers is final from here on.
+        self.__finish(key)
+        try:
+            if call.followers and share is not None:
+                result = share(result)
+        except Exception:
+            call.exc_info = sys.exc_info()
+            raise
+        else:
+            call.result = result
+        finally:
+            call.done.set()
+        return result, False
+
+    def __finish(self, key):
+        with self.lock:
+            del self.calls[key]
@@ -0,0 +1,109 @@
+import sqlite3
+import threading
+
+from datetime import timedelta
+
+import boompy
+from .base_api import API
+from .dates import format_datetime, parse_datetime
+
+DEFAULT_OVERLAP = timedelta(minutes=5)
+
+class CheckpointStore(object):
+    """ Keeps the high water mark of each sync, and the ids it has seen recently, in a SQLite
+        database so a sync picks up where it left off after a restart. """
+
+    def __init__(self, path=":memory:"):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS watermarks "
+                              "(sync_key TEXT PRIMARY KEY, watermark TEXT NOT NULL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS seen "
+                              "(sync_key TEXT, entity_id TEXT, stamp TEXT, "
+                              "PRIMARY KEY (sync_key, entity_id))")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS seen_stamp ON seen (sync_key, stamp)")
+
+    def watermark(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT watermark FROM watermarks WHERE sync_key = ?",
+                                    (key,)).fetchone()
+        return parse_datetime(row[0]) if row else None
+
+    def seen_ids(self, key, since):
+        """ Ids seen by the sync `key` whose timestamp is at or after `since`. """
+        with self.lock:
+            rows = self.conn.execute("SELECT entity_id FROM seen WHERE sync_key = ? AND stamp >= ?",
+                                     (key, format_datetime(since))).fetchall()
+        return set(row[0] for row in rows)
+
+    def commit(self, key, watermark, seen):
+        """ Atomically records a new high water mark and the ids (mapped to their timestamps) seen
+            since the last commit. """
+        with self.lock, self.conn:
+            if watermark is not None:
+                self.conn.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?)",
+                                  (key, format_datetime(watermark)))
+            self.conn.executemany("INSERT OR REPLACE INTO seen VALUES (?, ?, ?)",
+                                  ((key, entity_id, format_datetime(stamp) if stamp else "")
+                                   for entity_id, stamp in seen.iteritems()))
+
+    def prune(self, key, before):
+        """ Forgets ids seen by the sync `key` with a timestamp before `before`. """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM seen WHERE sync_key = ? AND stamp < ?",
+                              (key, format_datetime(before)))
+
+
+class IncrementalSync(object):
+    """ Pulls only the entities of `resource` which are new since the last poll.
+
+        Each poll queries for entities whose `date_attr` is at or after the stored high water mark
+        minus `overlap`, so entities which show up late are still picked up, and skips the ones
+        already seen by their _id_attr. Checkpoints are kept per account and partner account. """
+
+    def __init__(self, resource, store, date_attr, overlap=DEFAULT_OVERLAP, start=None):
+        self.resource = resource
+        self.store = store
+        self.date_attr = date_attr
+        self.overlap = overlap
+        self.start = start
+
+    def key(self):
+        api = API()
+        return "%s:%s:%s" % (self.resource._name, api.account_id, api.partner_account or "")
+
+    def poll(self, **filters):
+        """ Yields every new entity matching the query kwargs. The checkpoint only moves forward once
+            every entity has been yielded, so if the consumer dies part way through, the next poll
+            delivers them again. """
+        key = self.key()
+        watermark = self.store.watermark(key) or self.start
+
+        seen = set()
+        if watermark is not None:
+            since = watermark - self.overlap
+            seen = self.store.seen_ids(key, since)
+            filters["%s__gte" % self.date_attr] = format_datetime(since)
+
+        new_seen = {}
+        high = watermark
+        for entity in self.resource.query(refresh=True, **filters):
+            entity_id = getattr(entity, self.resource._id_attr)
+            if entity_id in seen or entity_id in new_seen:
+                continue
+
+            stamp = getattr(entity, self.date_attr)
+            new_seen[entity_id] = stamp
+            if stamp is not None and (high is None or stamp > high):
+                high = stamp
+            yield entity
+
+        self.store.commit(key, high, new_seen)
+        if high is not None:
+            self.store.prune(key, high - self.overlap)
+
+
+def event_sync(store, overlap=DEFAULT_OVERLAP, start=None):
+    """ An IncrementalSync of boompy.Event on eventDate. """
+    return IncrementalSync(boompy.Event, store, "eventDate", overlap=overlap, start=start)
@@ -0,0 +1,73 @@
+import socket
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.connection import HTTPConnection
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# Seconds to wait for a connection to boomi, and for each read from it. Large queries can take a
+# while before boomi starts answering, hence the long read timeout.
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 120
+
+# Seconds a connection sits idle before the OS starts probing it, between probes, and how many
+# unanswered probes it takes to drop the connection.
+KEEPALIVE_IDLE = 60
+KEEPALIVE_INTERVAL = 15
+KEEPALIVE_COUNT = 4
+
+def keepalive_socket_options():
+    """ Socket options turning on TCP keep-alive, with the probe timings wherever the OS lets us
+        set them. """
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    for name, value in (("TCP_KEEPIDLE", KEEPALIVE_IDLE), ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+                        ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class BoomiAdapter(HTTPAdapter):
+    """ An HTTPAdapter with a default timeout on every request and, optionally, TCP keep-alive on
+        every connection so idle pooled connections aren't silently dropped by a firewall.
+
+        `pool_connections` is how many hosts get a pool and `pool_maxsize` how many connections each
+        pool keeps open. Requests beyond pool_maxsize wait for a free connection. """
+    timeout = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+    keepalive = True
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 keepalive=True):
+        self.timeout = (connect_timeout, read_timeout)
+        self.keepalive = keepalive
+        super(BoomiAdapter, self).__init__(pool_connections=pool_connections,
+                                           pool_maxsize=pool_maxsize, pool_block=True)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.keepalive:
+            pool_kwargs["socket_options"] = (HTTPConnection.default_socket_options +
+                                             keepalive_socket_options())
+        super(BoomiAdapter, self).init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super(BoomiAdapter, self).send(request, **kwargs)
+
+    def stats(self):
+        """ How many connections were opened and how many requests were sent over them, across
+            every pool still open. A requests count well above connections means connections are
+            being reused rather than paying for a new TLS handshake per call. """
+        stats = {"pools": 0, "connections": 0, "requests": 0}
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["pools"] += 1
+            stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+        stats["reused"] = max(0, stats["requests"] - stats["connections"])
+        return stats
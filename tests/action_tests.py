@@ -183,3 +183,32 @@ def test_failed_update_on_account(post_patch):
     post_patch.return_value = make_mock_json_response(fake_content)
     boompy.set_auth("account_id", "username", "password")
     boompy.actions.updatePartnerCustomerAccount(fake_data)
+
+@mock.patch.object(requests.Session, "get", autospec=True)
+@mock.patch.object(requests.Session, "post", autospec=True)
+def test_provision_accounts_concurrently(post_patch, get_patch):
+    """
+    Test that many provisions can be in flight at once and are polled in the background
+    """
+
+    fake_data = {
+        "name": "HelloWorld",
+        "street": "Fake Street",
+        "city": "Fake City",
+        "stateCode": "NA",
+        "zipCode": "00000",
+        "countryCode": "NA",
+        "status": "trial",
+        "product": [{"productCode": "fake", "quantity": 1}]
+    }
+
+    post_patch.return_value = make_mock_json_response({"id": "provision", "status": "PENDING"})
+    get_patch.return_value = make_mock_json_response({"id": "provision", "status": "COMPLETED",
+                                                      "accountId": "sub-account"})
+    boompy.set_auth("account_id", "username", "password")
+
+    futures = [boompy.actions.provisionPartnerCustomerAccountAsync(fake_data) for _ in range(10)]
+    assert post_patch.call_count == 10
+    for future in futures:
+        assert future.get(timeout=10).get("accountId") == "sub-account"
+    assert get_patch.call_count == 10
@@ -0,0 +1,39 @@
+import mock
+import requests
+
+from nose.tools import raises
+
+import boompy
+
+from boompy.async_api import AsyncAPI
+from boompy.base_api import API
+from boompy.errors import NotFoundError
+
+from helpers import make_response
+
+def test_async_api_singleton():
+    assert AsyncAPI() is AsyncAPI()
+
+def test_configure_resizes_connection_pool():
+    boompy.set_auth("account_id", "username", "password")
+    boompy.set_concurrency(4)
+    assert AsyncAPI().concurrency == 4
+    assert API().pool_size == 4
+    assert API().session.get_adapter("https://api.boomi.com")._pool_maxsize == 4
+
+@mock.patch.object(requests.Session, "get")
+def test_get_async(get_patch):
+    get_patch.return_value = make_response(200, {"id": "env1", "name": "Prod"})
+    boompy.set_auth("account_id", "username", "password")
+
+    pending = [boompy.Environment.get_async("env%s" % i) for i in range(5)]
+    results = [p.get(timeout=5) for p in pending]
+    assert all(env.name == "Prod" for env in results)
+    assert get_patch.call_count == 5
+
+@raises(NotFoundError)
+@mock.patch.object(requests.Session, "get")
+def test_get_async_error_mapping(get_patch):
+    get_patch.return_value = make_response(404, {"message": "nope"})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.Environment.get_async("missing").get(timeout=5)
@@ -78,3 +78,135 @@ def test_atom_resource_has_attribute():
 
     for key in added_attributes:
         assert key in atom_attributes, "%s is not an Atom attribute." % key
+
+def test_resources_use_slots():
+    event = boompy.Event(eventId="1", status="COMPLETE")
+    assert not hasattr(event, "__dict__")
+    assert event.eventId == "1"
+    assert event.atomId is None
+
+    account = boompy.Account(name="test")
+    assert not hasattr(account, "__dict__")
+    assert account.name == "test"
+    assert account.accountId is None
+
+def test_to_record():
+    TestType = Resource.create_resource("TestType", ("thing1", "thing2"), id_attr="thing1")
+    record = TestType(thing1=1).to_record()
+    assert isinstance(record, tuple)
+    assert record.thing1 == 1
+    assert record.thing2 is None
+
+def test_resource_copy():
+    import copy
+
+    event = boompy.Event(eventId="1", title="hello")
+    copied = copy.deepcopy(event)
+    assert copied is not event
+    assert copied.eventId == "1"
+    assert copied.title == "hello"
+
+@mock.patch.object(API, "https_request")
+def test_get_lazy_nested_attributes(request_mock):
+    API()._set_auth("account_id", "username", "password")
+
+    class MockResponse(object):
+        content = ('{"@type": "EnvironmentExtensions", "id": "ext1", "environmentId": "env1", '
+                   '"connections": {"@type": "Connections", "connection": [{"@type": "C", '
+                   '"id": "c1"}]}}')
+
+    request_mock.return_value = MockResponse()
+
+    ext = boompy.EnvironmentExtensions.get("ext1", lazy=True)
+    slot = type(ext).connections.slot
+    assert slot.__get__(ext, type(ext)).__class__.__name__ == "RawJSON"
+    assert ext.connections == {"connection": [{"id": "c1"}]}
+    assert slot.__get__(ext, type(ext)) == {"connection": [{"id": "c1"}]}
+    assert ext.processProperties is None
+    assert ext.environmentId == "env1"
+
+@mock.patch.object(API, "https_request")
+def test_get_fields(request_mock):
+    API()._set_auth("account_id", "username", "password")
+
+    class MockResponse(object):
+        content = ('{"@type": "Process", "id": "p1", "name": "Sync", '
+                   '"integrationpackId": "ip1", "integrationpackInstanceId": "ipi1"}')
+
+    request_mock.return_value = MockResponse()
+
+    process = boompy.Process.get("p1", fields=("id", "name"))
+    assert process.id == "p1"
+    assert process.name == "Sync"
+    assert process.integrationpackId is None
+
+@raises(boompy.errors.InterfaceError)
+def test_unknown_field():
+    boompy.Event._field_plan(("eventId", "nope"))
+
+@mock.patch.object(API, "https_request")
+def test_save_skips_clean_entities(request_mock):
+    API()._set_auth("account_id", "username", "password")
+
+    class MockResponse(object):
+        content = ('{"@type": "ProcessSchedules", "id": "s1", "atomId": "a1", "processId": "p1", '
+                   '"Schedule": [{"@type": "Schedule", "minutes": "0"}]}')
+
+    request_mock.return_value = MockResponse()
+    schedules = boompy.ProcessSchedules.get("s1")
+    assert not schedules.is_dirty()
+
+    schedules.save()
+    assert request_mock.call_count == 1
+
+    schedules.Schedule[0]["minutes"] = "30"
+    assert schedules.changes() == {"Schedule": [{"minutes": "30"}]}
+    schedules.save()
+    assert request_mock.call_count == 2
+    assert request_mock.call_args[0][2] == {"id": "s1", "atomId": "a1", "processId": "p1",
+                                            "Schedule": [{"minutes": "30"}]}
+
+    # The response is the new snapshot.
+    assert not schedules.is_dirty()
+    schedules.save(force=True)
+    assert request_mock.call_count == 3
+
+@mock.patch.object(API, "https_request")
+def test_lazy_changes_stay_undecoded(request_mock):
+    API()._set_auth("account_id", "username", "password")
+
+    class MockResponse(object):
+        content = ('{"@type": "EnvironmentExtensions", "id": "ext1", "environmentId": "env1", '
+                   '"connections": {"@type": "Connections", "connection": []}}')
+
+    request_mock.return_value = MockResponse()
+    ext = boompy.EnvironmentExtensions.get("ext1", lazy=True)
+    ext.extensionGroupId = "group"
+    assert ext.changes() == {"extensionGroupId": "group"}
+    slot = type(ext).connections.slot
+    assert slot.__get__(ext, type(ext)).__class__.__name__ == "RawJSON"
+
+    ext.save(changed_only=True)
+    assert request_mock.call_args[0][2] == {"id": "ext1", "environmentId": "env1",
+                                            "extensionGroupId": "group", "partial": True}
+
+@mock.patch.object(API, "https_request")
+def test_save_sends_full_body_by_default(request_mock):
+    API()._set_auth("account_id", "username", "password")
+
+    class MockResponse(object):
+        content = ('{"@type": "EnvironmentExtensions", "id": "ext1", "environmentId": "env1", '
+                   '"connections": {"@type": "Connections", "connection": []}}')
+
+    request_mock.return_value = MockResponse()
+    ext = boompy.EnvironmentExtensions.get("ext1")
+    ext.extensionGroupId = "group"
+    ext.save()
+    assert request_mock.call_args[0][2] == {"id": "ext1", "environmentId": "env1",
+                                            "extensionGroupId": "group",
+                                            "connections": {"connection": []}}
+
+def test_new_entities_are_dirty():
+    env = boompy.Environment(name="Prod")
+    assert env.changes() == {"name": "Prod"}
+    assert env.serialize(["name", "classification"]) == {"name": "Prod", "classification": None}
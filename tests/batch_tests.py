@@ -0,0 +1,215 @@
+import json
+
+import mock
+import requests
+
+from nose.tools import raises
+
+import boompy
+
+from boompy.batch import BatchResult
+from boompy.errors import BulkItemError, NotFoundError
+
+from helpers import make_response
+
+def bulk_response(url, data=None, **kwargs):
+    ids = [request["id"] for request in json.loads(data)["request"]]
+    responses = []
+    for index, boomi_id in enumerate(ids):
+        if boomi_id.startswith("missing"):
+            responses.append({"@type": "BulkResponse", "index": index, "id": boomi_id,
+                              "statusCode": 400, "errorMessage": "Invalid id"})
+        else:
+            responses.append({"@type": "BulkResponse", "index": index, "id": boomi_id,
+                              "statusCode": 200,
+                              "Result": {"@type": "Atom", "id": boomi_id, "name": boomi_id}})
+    responses.reverse()
+    return make_response(200, {"@type": "BulkResult", "response": responses})
+
+def test_batch_result():
+    result = BatchResult(3)
+    result.succeed(0, "a")
+    result.fail(1, ValueError("b"))
+    result.succeed(2, "c")
+    assert not result.ok
+    assert result.succeeded == [(0, "a"), (2, "c")]
+    assert [index for index, _ in result.failed] == [1]
+
+@mock.patch.object(requests.Session, "post")
+def test_get_many_bulk(post_patch):
+    post_patch.side_effect = bulk_response
+    boompy.set_auth("account_id", "username", "password")
+
+    ids = ["atom%s" % i for i in range(250)]
+    ids[120] = "missing120"
+    result = boompy.Atom.get_many(ids)
+
+    assert post_patch.call_count == 3
+    for args, kwargs in post_patch.call_args_list:
+        assert args[0].endswith("/Atom/bulk")
+        assert len(json.loads(kwargs["data"])["request"]) <= 100
+
+    assert len(result) == 250
+    assert [atom.id for atom in result if atom is not None] == \
+        [boomi_id for boomi_id in ids if boomi_id != "missing120"]
+    assert result.failed[0][0] == 120
+    assert isinstance(result.failed[0][1], BulkItemError)
+    assert result.failed[0][1].boomi_id == "missing120"
+
+@mock.patch.object(requests.Session, "get")
+def test_get_many_falls_back_to_get(get_patch):
+    def get(url, **kwargs):
+        boomi_id = url.rsplit("/", 1)[1]
+        if boomi_id == "missing":
+            return make_response(404, {"message": "not found"})
+        return make_response(200, {"id": boomi_id})
+
+    get_patch.side_effect = get
+    boompy.set_auth("account_id", "username", "password")
+
+    result = boompy.AtomExtensions.get_many(["ext1", "missing", "ext3"])
+    assert get_patch.call_count == 3
+    assert result[0].id == "ext1"
+    assert result[1] is None
+    assert result[2].id == "ext3"
+    assert isinstance(result.errors[1], NotFoundError)
+
+@raises(NotFoundError)
+@mock.patch.object(requests.Session, "get")
+def test_raise_for_errors(get_patch):
+    get_patch.return_value = make_response(404, {"message": "not found"})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.AtomExtensions.get_many(["ext1"]).raise_for_errors()
+
+@mock.patch.object(requests.Session, "post")
+def test_save_many(post_patch):
+    def post(url, data=None, **kwargs):
+        payload = json.loads(data)
+        if payload["atomId"] == "bad":
+            return make_response(400, {"message": "bad atom"})
+        payload["id"] = "attachment-%s" % payload["atomId"]
+        return make_response(200, payload)
+
+    post_patch.side_effect = post
+    boompy.set_auth("account_id", "username", "password")
+
+    attachments = [boompy.ProcessAtomAttachment(atomId=atom_id, processId="process")
+                   for atom_id in ("a1", "bad", "a3")]
+    result = boompy.Resource.save_many(attachments)
+
+    assert post_patch.call_count == 3
+    assert [index for index, _ in result.succeeded] == [0, 2]
+    assert result[0].id == "attachment-a1"
+    assert attachments[2].id == "attachment-a3"
+    assert str(result.errors[1]) == "400: bad atom"
+
+@mock.patch.object(requests.Session, "post")
+def test_save_many_records_any_error(post_patch):
+    def post(url, data=None, **kwargs):
+        payload = json.loads(data)
+        if payload["atomId"] == "a2":
+            return make_response(200, content="")
+        return make_response(200, dict(payload, id="attachment-%s" % payload["atomId"]))
+
+    post_patch.side_effect = post
+    boompy.set_auth("account_id", "username", "password")
+
+    attachments = [boompy.ProcessAtomAttachment(atomId=atom_id, processId="process")
+                   for atom_id in ("a1", "a2", "a3")]
+    result = boompy.Resource.save_many(attachments)
+
+    assert [index for index, _ in result.succeeded] == [0, 2]
+    assert isinstance(result.errors[1], ValueError)
+
+@mock.patch.object(requests.Session, "post")
+def test_save_many_on_worker(post_patch):
+    post_patch.side_effect = lambda url, data=None, **kwargs: make_response(200, json.loads(data))
+    boompy.set_auth("account_id", "username", "password")
+    # With one worker, saves queued on the pool would never run.
+    boompy.set_concurrency(1)
+
+    try:
+        attachments = [boompy.ProcessAtomAttachment(atomId="a%s" % i) for i in range(3)]
+        result = boompy.AsyncAPI().submit(boompy.Resource.save_many, attachments).get(timeout=5)
+        assert len(result.succeeded) == 3
+    finally:
+        boompy.set_concurrency(boompy.base_api.DEFAULT_POOL_SIZE)
+
+def test_save_many_checks_capabilities():
+    from boompy.errors import APIMethodNotAllowedError
+
+    boompy.set_auth("account_id", "username", "password")
+    result = boompy.Event.save_many([boompy.Event(eventId="1")])
+    assert isinstance(result.errors[0], APIMethodNotAllowedError)
+
+@mock.patch.object(requests.Session, "delete")
+def test_delete_many(delete_patch):
+    delete_patch.return_value = make_response(200, {})
+    boompy.set_auth("account_id", "username", "password")
+
+    attachments = [boompy.EnvironmentAtomAttachment(id="attachment%s" % i) for i in range(5)]
+    attachments.append(boompy.EnvironmentAtomAttachment())
+    result = boompy.EnvironmentAtomAttachment.delete_many(attachments)
+
+    assert delete_patch.call_count == 5
+    assert len(result.succeeded) == 5
+    assert result.failed[0][0] == 5
+
+@mock.patch.object(requests.Session, "post")
+def test_diff_many(post_patch):
+    post_patch.side_effect = bulk_response
+    boompy.set_auth("account_id", "username", "password")
+
+    wanted = [boompy.Atom(id="a1", name="a1"), boompy.Atom(id="a2", name="renamed"),
+              boompy.Atom(id="missing")]
+    result = boompy.Atom.diff_many(wanted)
+
+    assert post_patch.call_count == 1
+    assert result[0] == {}
+    assert result[1] == {"name": ("renamed", "a2")}
+    assert isinstance(result.errors[2], BulkItemError)
+
+@mock.patch.object(requests.Session, "post")
+def test_get_many_missing_responses(post_patch):
+    post_patch.return_value = make_response(200, {"@type": "BulkResult", "response": [
+        {"@type": "BulkResponse", "index": 0, "id": "a1", "statusCode": 200,
+         "Result": {"@type": "Atom", "id": "a1", "name": "a1"}},
+        {"@type": "BulkResponse", "id": "a3", "statusCode": 200,
+         "Result": {"@type": "Atom", "id": "a3", "name": "a3"}},
+    ]})
+    boompy.set_auth("account_id", "username", "password")
+
+    result = boompy.Atom.get_many(["a1", "a2", "a3"])
+    assert not result.ok
+    assert [index for index, _ in result.succeeded] == [0, 2]
+    assert result[2].name == "a3"
+    assert isinstance(result.errors[1], BulkItemError)
+    assert result.errors[1].boomi_id == "a2"
+
+@mock.patch.object(requests.Session, "post")
+def test_get_many_undecodable_chunk(post_patch):
+    def post(url, data=None, **kwargs):
+        if json.loads(data)["request"][0]["id"] == "a100":
+            return make_response(200, content="")
+        return bulk_response(url, data)
+
+    post_patch.side_effect = post
+    boompy.set_auth("account_id", "username", "password")
+
+    result = boompy.Atom.get_many(["a%s" % i for i in range(150)])
+    assert post_patch.call_count == 2
+    assert [index for index, _ in result.succeeded] == range(100)
+    assert all(isinstance(result.errors[i], ValueError) for i in range(100, 150))
+
+@mock.patch.object(requests.Session, "get")
+def test_get_many_on_worker(get_patch):
+    get_patch.side_effect = lambda url, **kwargs: make_response(200, {"id": url.rsplit("/", 1)[1]})
+    boompy.set_auth("account_id", "username", "password")
+    # With one worker, gets queued on the pool would never run.
+    boompy.set_concurrency(1)
+
+    try:
+        job = boompy.AsyncAPI().submit(boompy.AtomExtensions.get_many, ["e1", "e2"])
+        assert [entity.id for _, entity in job.get(timeout=5).succeeded] == ["e1", "e2"]
+    finally:
+        boompy.set_concurrency(boompy.base_api.DEFAULT_POOL_SIZE)
@@ -0,0 +1,211 @@
+import threading
+import time
+
+import mock
+import requests
+
+import boompy
+
+from boompy.cache import LRUCache, MISSING
+
+from helpers import make_query_response, make_response
+
+def test_lru_eviction():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, 60)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+def test_lru_skips_oversized_entries():
+    cache = LRUCache(max_size=10)
+    for key in "abcde":
+        cache.set(key, key, 60)
+    assert cache.set("big", "big", 60, size=11) is False
+    assert len(cache) == 5
+    assert cache.size == 5
+    assert cache.get("big") is MISSING
+    assert cache.get("a") == "a"
+
+def test_lru_ttl():
+    cache = LRUCache()
+    cache.set("a", 1, .05)
+    assert cache.get("a") == 1
+    time.sleep(.1)
+    assert cache.get("a") is MISSING
+
+@mock.patch.object(requests.Session, "get")
+def test_get_is_cached(get_patch):
+    get_patch.return_value = make_response(200, {"id": "env1", "name": "Prod"})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_cache(ttls={"Atom": 0})
+
+    try:
+        first = boompy.Environment.get("env1")
+        second = boompy.Environment.get("env1")
+        assert get_patch.call_count == 1
+        assert second.name == "Prod"
+        assert second is not first
+
+        # Cached entities are copies, so changing one doesn't change the cache.
+        second.name = "Changed"
+        assert boompy.Environment.get("env1").name == "Prod"
+
+        boompy.Atom.get("atom1")
+        boompy.Atom.get("atom1")
+        assert get_patch.call_count == 3
+
+        stats = boompy.cache_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+    finally:
+        boompy.disable_cache()
+
+@mock.patch.object(requests.Session, "get")
+def test_cache_respects_sub_account(get_patch):
+    get_patch.return_value = make_response(200, {"id": "env1", "name": "Prod"})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_cache()
+
+    try:
+        boompy.Environment.get("env1")
+        with boompy.sub_account("customer"):
+            boompy.Environment.get("env1")
+            boompy.Environment.get("env1")
+        assert get_patch.call_count == 2
+    finally:
+        boompy.disable_cache()
+
+@mock.patch.object(requests.Session, "get")
+@mock.patch.object(requests.Session, "post")
+def test_save_invalidates(post_patch, get_patch):
+    get_patch.return_value = make_response(200, {"id": "env1", "name": "Prod"})
+    post_patch.return_value = make_response(200, {"id": "env1", "name": "Renamed"})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_cache()
+
+    try:
+        env = boompy.Environment.get("env1")
+        env.name = "Renamed"
+        env.save()
+        boompy.Environment.get("env1")
+        assert get_patch.call_count == 2
+        assert boompy.cache_stats()["invalidations"] == 1
+    finally:
+        boompy.disable_cache()
+
+@mock.patch.object(requests.Session, "get")
+@mock.patch.object(requests.Session, "post")
+def test_write_during_get_is_not_cached_over(post_patch, get_patch):
+    started, release = threading.Event(), threading.Event()
+
+    def get(url, **kwargs):
+        started.set()
+        release.wait()
+        return make_response(200, {"id": "env1", "name": "Prod"})
+
+    get_patch.side_effect = get
+    post_patch.return_value = make_response(200, {"id": "env1", "name": "Renamed"})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_cache()
+
+    try:
+        reader = threading.Thread(target=boompy.Environment.get, args=("env1",))
+        reader.start()
+        started.wait()
+        boompy.Environment(id="env1", name="Renamed").save()
+        release.set()
+        reader.join()
+
+        # The read started before the write, so what it got back was not cached.
+        boompy.Environment.get("env1")
+        assert get_patch.call_count == 2
+        assert boompy.API().cache.loads == {}
+    finally:
+        boompy.disable_cache()
+
+@mock.patch.object(requests.Session, "get")
+def test_diff_many_skips_cache(get_patch):
+    get_patch.return_value = make_response(200, {"id": "ext1", "atomId": "a1"})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_cache()
+
+    try:
+        wanted = boompy.AtomExtensions.get("ext1")
+        get_patch.return_value = make_response(200, {"id": "ext1", "atomId": "a2"})
+        assert boompy.AtomExtensions.diff_many([wanted])[0] == {"atomId": ("a1", "a2")}
+        assert get_patch.call_count == 2
+    finally:
+        boompy.disable_cache()
+
+def test_canonical_query():
+    from boompy.cache import canonical_query
+
+    first = boompy.Environment._query_filter(name="Prod", classification="PROD")
+    second = boompy.Environment._query_filter(classification="PROD", name="Prod")
+    first["QueryFilter"]["expression"]["nestedExpression"].reverse()
+    assert canonical_query(first) == canonical_query(second)
+    assert canonical_query(first) != canonical_query(boompy.Environment._query_filter(name="Prod"))
+    assert canonical_query({}) == canonical_query(boompy.Environment._query_filter())
+
+@mock.patch.object(requests.Session, "post")
+def test_query_is_cached(post_patch):
+    post_patch.side_effect = lambda *args, **kwargs: make_query_response(
+        [{"id": "env1", "classification": "PROD"}])
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_query_cache()
+
+    try:
+        assert len(boompy.Environment.query(classification="PROD")) == 1
+        results = boompy.Environment.query(classification="PROD")
+        assert post_patch.call_count == 1
+        assert [env.id for env in results] == ["env1"]
+
+        boompy.Environment.query(classification="PROD", refresh=True)
+        assert post_patch.call_count == 2
+
+        boompy.Environment.query(classification="TEST")
+        assert post_patch.call_count == 3
+
+        with boompy.sub_account("customer"):
+            boompy.Environment.query(classification="PROD")
+        assert post_patch.call_count == 4
+        assert boompy.query_cache_stats()["hits"] == 1
+    finally:
+        boompy.disable_query_cache()
+
+@mock.patch.object(requests.Session, "post")
+def test_query_cache_invalidated_by_writes(post_patch):
+    post_patch.side_effect = lambda *args, **kwargs: make_query_response(
+        [{"id": "env1", "name": "Prod"}])
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_query_cache()
+
+    try:
+        env = list(boompy.Environment.query())[0]
+        env.name = "Production"
+        env.save()
+        boompy.Environment.query()
+        assert post_patch.call_count == 3
+    finally:
+        boompy.disable_query_cache()
+
+def test_query_cache_max_rows():
+    from boompy.cache import QueryCache
+
+    cache = QueryCache(max_rows=3)
+    boompy.set_auth("account_id", "username", "password")
+    cache.set(boompy.Environment, {}, [boompy.Environment(id="1"), boompy.Environment(id="2")])
+    cache.set(boompy.Atom, {}, [boompy.Atom(id="1"), boompy.Atom(id="2")])
+    assert cache.get(boompy.Environment, {}) is None
+    assert len(cache.get(boompy.Atom, {})) == 2
+    assert cache.stats()["rows"] == 2
+
+    # A result bigger than the whole cache leaves the rest of it alone.
+    results = cache.set(boompy.Role, {}, [boompy.Role(id=str(i)) for i in range(4)])
+    assert len(results) == 4
+    assert cache.get(boompy.Role, {}) is None
+    assert len(cache.get(boompy.Atom, {})) == 2
@@ -0,0 +1,118 @@
+import threading
+
+import mock
+import requests
+
+from nose.tools import raises
+
+import boompy
+
+from boompy.base_api import API, default_api
+
+from helpers import make_response
+
+def echo_auth(session, url, data=None, **kwargs):
+    """ Responds with the account and user the request was sent as. """
+    return make_response(200, {"id": url.split("/")[-3], "name": session.auth[0]})
+
+def test_api_routes_through_client():
+    boompy.set_auth("account_id", "username", "password")
+    client = boompy.Client("client_account", "client_user", "password")
+    singleton = API()
+
+    with boompy.use_client(client) as used:
+        assert used is client
+        assert API() is client
+        assert API().base_url() == "https://api.boomi.com/api/rest/v1/client_account"
+    assert API() is singleton
+
+@raises(AttributeError)
+def test_client_is_immutable():
+    client = boompy.Client("client_account", "client_user", "password")
+    client.account_id = "other"
+
+@raises(AttributeError)
+def test_set_auth_inside_client():
+    with boompy.use_client(boompy.Client("client_account", "client_user", "password")):
+        boompy.set_auth("account_id", "username", "password")
+
+def test_settings_inside_client_go_to_the_singleton():
+    client = boompy.Client("client_account", "client_user", "password")
+    limiter = default_api().rate_limiter
+
+    with boompy.use_client(client):
+        try:
+            boompy.enable_cache()
+            boompy.enable_query_cache()
+            boompy.set_rate_limiter(None)
+            assert default_api().cache is not None
+            assert default_api().query_cache is not None
+            assert client.cache is None
+            assert boompy.cache_stats() == {}
+        finally:
+            boompy.disable_cache()
+            boompy.disable_query_cache()
+            boompy.set_rate_limiter(limiter)
+    assert default_api().cache is None
+
+def test_clients_share_connection_pool():
+    url = "https://api.boomi.com"
+    first = boompy.Client("first", "user", "password")
+    second = boompy.Client("second", "user", "password")
+    assert first.session.get_adapter(url) is second.session.get_adapter(url)
+
+    own = boompy.Client("own", "user", "password", adapter=requests.adapters.HTTPAdapter())
+    assert own.session.get_adapter(url) is not first.session.get_adapter(url)
+
+@mock.patch.object(requests.Session, "get", autospec=True)
+def test_clients_in_threads(get_patch):
+    get_patch.side_effect = echo_auth
+    boompy.set_auth("account_id", "username", "password")
+    results = {}
+
+    def work(name):
+        with boompy.use_client(boompy.Client(name, "%s_user" % name, "password")):
+            for _ in range(10):
+                environment = boompy.Environment.get("env1")
+                results.setdefault(name, set()).add((environment.id, environment.name))
+
+    threads = [threading.Thread(target=work, args=(name,)) for name in ("a", "b", "c")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"a": set([("a", "a_user")]), "b": set([("b", "b_user")]),
+                       "c": set([("c", "c_user")])}
+
+@mock.patch.object(requests.Session, "get", autospec=True)
+def test_client_sub_account_and_async(get_patch):
+    get_patch.side_effect = lambda session, url, data=None, **kwargs: make_response(200, {
+        "id": url, "name": session.auth[0]})
+    boompy.set_auth("account_id", "username", "password")
+    client = boompy.Client("client_account", "client_user", "password", partner_account="default")
+
+    with boompy.use_client(client):
+        assert API().partner_account == "default"
+        with boompy.sub_account("customer"):
+            pending = boompy.Environment.get_async("env1")
+        assert API().partner_account == "default"
+
+    environment = pending.get(timeout=5)
+    assert environment.name == "client_user"
+    assert environment.id.endswith("/client_account/Environment/env1?overrideAccount=customer")
+
+@mock.patch.object(requests.Session, "post")
+def test_actions_route_through_client(post_patch):
+    post_patch.return_value = make_response(200, {})
+    boompy.set_auth("account_id", "username", "password")
+    client = boompy.Client("client_account", "client_user", "password")
+
+    with boompy.use_client(client):
+        boompy.actions.executeProcess("process", "atom")
+    assert post_patch.call_args[0][0] == \
+        "https://api.boomi.com/api/rest/v1/client_account/executeProcess"
+
+    boompy.actions.executeProcess("process", "atom")
+    assert post_patch.call_args[0][0] == \
+        "https://api.boomi.com/api/rest/v1/account_id/executeProcess"
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from nose.tools import raises
+
+import boompy
+
+from boompy.dates import parse_datetime, format_datetime
+
+def test_parse_datetime():
+    assert parse_datetime("2016-03-01T10:01:05Z") == datetime(2016, 3, 1, 10, 1, 5)
+
+@raises(ValueError)
+def test_parse_datetime_invalid_date():
+    parse_datetime("2016-02-30T10:01:05Z")
+
+@raises(ValueError)
+def test_parse_datetime_other_format():
+    parse_datetime("2016-03-01 10:01:05")
+
+def test_format_datetime():
+    assert format_datetime(datetime(2016, 3, 1, 10, 1, 5)) == "2016-03-01T10:01:05Z"
+    assert format_datetime(datetime(1850, 1, 1)) == "1850-01-01T00:00:00Z"
+
+def test_decode_plan():
+    plan = dict(boompy.Event._decode_plan)
+    assert plan["eventDate"]
+    assert plan["startTime"]
+    assert not plan["eventId"]
+
+def test_date_round_trip():
+    event = boompy.Event()
+    event._update_attrs_from_response({"eventId": "1", "eventDate": "2016-03-01T10:01:05Z"})
+    assert event.eventDate == datetime(2016, 3, 1, 10, 1, 5)
+    assert event.serialize() == {"eventId": "1", "eventDate": "2016-03-01T10:01:05Z"}
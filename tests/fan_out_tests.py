@@ -0,0 +1,85 @@
+import threading
+
+import mock
+import requests
+
+import boompy
+
+from boompy.base_api import API
+from boompy.errors import APIRequestError
+
+from helpers import make_response
+
+def override_account(url):
+    return url.split("overrideAccount=")[1] if "overrideAccount=" in url else None
+
+def atoms_for_account(url, data=None, **kwargs):
+    account = override_account(url)
+    if account == "broken":
+        return make_response(500, {"message": "nope"})
+    return make_response(200, {"numberOfResults": 2, "result": [
+        {"id": "%s-1" % account, "status": "OFFLINE"},
+        {"id": "%s-2" % account, "status": "OFFLINE"}]})
+
+@mock.patch.object(requests.Session, "post")
+def test_query_accounts(post_patch):
+    post_patch.side_effect = atoms_for_account
+    boompy.set_auth("account_id", "username", "password")
+
+    results = boompy.Atom.query_accounts(["c1", "c2", "c3"], status="OFFLINE")
+    rows = list(results)
+    assert sorted((account, atom.id) for account, atom in rows) == [
+        ("c1", "c1-1"), ("c1", "c1-2"), ("c2", "c2-1"), ("c2", "c2-2"),
+        ("c3", "c3-1"), ("c3", "c3-2")]
+    assert results.ok
+    assert post_patch.call_count == 3
+
+    # The caller's own override was left alone.
+    assert API().partner_account is None
+
+@mock.patch.object(requests.Session, "post")
+def test_query_accounts_errors(post_patch):
+    post_patch.side_effect = atoms_for_account
+    boompy.set_auth("account_id", "username", "password")
+
+    results = boompy.Atom.query_accounts(["c1", "broken", "c2"])
+    assert sorted(account for account, _ in results) == ["c1", "c1", "c2", "c2"]
+    assert not results.ok
+    assert isinstance(results.errors["broken"], APIRequestError)
+
+    try:
+        results.raise_for_errors()
+        assert False, "expected an APIRequestError"
+    except APIRequestError:
+        pass
+
+def test_sub_account_is_per_thread():
+    boompy.set_auth("account_id", "username", "password")
+    entered = threading.Event()
+    checked = threading.Event()
+    seen = []
+
+    def in_sub_account():
+        with boompy.sub_account("customer"):
+            seen.append(API().partner_account)
+            entered.set()
+            checked.wait(5)
+
+    thread = threading.Thread(target=in_sub_account)
+    thread.start()
+    entered.wait(5)
+    seen.append(API().partner_account)
+    checked.set()
+    thread.join()
+
+    assert seen == ["customer", None]
+
+@mock.patch.object(requests.Session, "get")
+def test_async_calls_keep_sub_account(get_patch):
+    get_patch.side_effect = lambda url, data=None: make_response(200, {
+        "id": override_account(url)})
+    boompy.set_auth("account_id", "username", "password")
+
+    with boompy.sub_account("customer"):
+        pending = boompy.Environment.get_async("env1")
+    assert pending.get(timeout=5).id == "customer"
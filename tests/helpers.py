@@ -0,0 +1,17 @@
+""" Mock responses shared by the test modules. """
+import json
+
+import mock
+import requests
+
+def make_response(status_code=200, json_data=None, headers=None, content=None):
+    """ A mock boomi response whose body is `json_data` encoded, or `content` as it is. """
+    res_patch = mock.Mock(spec=requests.Response)
+    res_patch.status_code = status_code
+    res_patch.content = json.dumps(json_data) if content is None else content
+    res_patch.headers = headers or {}
+    return res_patch
+
+def make_query_response(rows):
+    """ A mock response holding one page of query results. """
+    return make_response(200, {"result": rows, "numberOfResults": len(rows)})
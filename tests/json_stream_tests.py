@@ -0,0 +1,69 @@
+import json
+
+from nose.tools import raises
+
+from boompy.json_stream import JSONStreamReader, RawJSON, iter_query_results, loads
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def test_reader_values_across_chunks():
+    reader = JSONStreamReader(chunked('[12345, "ab\\"c", {"x": [1, 2]}, 6.5e3]', 2))
+    reader.expect(u"[")
+    assert reader.value() == 12345
+    reader.expect(u",")
+    assert reader.value() == u'ab"c'
+    reader.expect(u",")
+    assert reader.value() == {"x": [1, 2]}
+    reader.expect(u",")
+    assert reader.value() == 6500.0
+    reader.expect(u"]")
+    assert reader.peek() is None
+
+def test_iter_query_results_meta_on_both_sides():
+    body = json.dumps({"numberOfResults": 2, "result": [{"id": 1}, {"id": 2}], "queryToken": "t"})
+    meta = {}
+    assert list(iter_query_results(chunked(body, 3), meta)) == [{"id": 1}, {"id": 2}]
+    assert meta == {"numberOfResults": 2, "queryToken": "t"}
+
+def test_iter_query_results_empty():
+    meta = {}
+    assert list(iter_query_results(['{"result": [], "numberOfResults": 0}'], meta)) == []
+    assert meta == {"numberOfResults": 0}
+    assert list(iter_query_results(["{}"], {})) == []
+
+def test_iter_query_results_multibyte_split():
+    body = u'{"result": [{"name": "\u65e5\u672c"}]}'.encode("utf-8")
+    assert list(iter_query_results(chunked(body, 1), {})) == [{"name": u"\u65e5\u672c"}]
+
+@raises(ValueError)
+def test_iter_query_results_truncated():
+    list(iter_query_results(['{"result": [{"id": 1}, {"id"'], {}))
+
+def test_strip_type_while_decoding():
+    body = ('{"result": [{"@type": "Env", '
+            '"props": {"@type": "P", "list": [{"@type": "X", "a": 1}]}}]}')
+    assert list(iter_query_results(chunked(body, 5), {})) == [{"props": {"list": [{"a": 1}]}}]
+
+def test_lazy_keys_left_raw():
+    body = ('{"result": [{"id": "1", '
+            '"big": {"s": "a } ] \\" [", "n": [1, {"@type": "T"}]}, "x": 2}]}')
+    rows = list(iter_query_results(chunked(body, 4), {}, lazy_keys=("big",)))
+    assert rows[0]["id"] == "1"
+    assert rows[0]["x"] == 2
+    assert isinstance(rows[0]["big"], RawJSON)
+    assert rows[0]["big"].decode() == {"s": u'a } ] " [', "n": [1, {}]}
+
+def test_loads_lazy():
+    payload = loads('{"@type": "A", "id": "1", "big": [1, 2]}', lazy_keys=("big",))
+    assert payload["id"] == "1"
+    assert "@type" not in payload
+    assert payload["big"].decode() == [1, 2]
+
+def test_iter_query_results_raw():
+    body = '{"result": [{"id": "a", "nested": {"x": [1, 2]}}, {"id": "b"}], "queryToken": "t"}'
+    meta = {}
+    rows = list(iter_query_results(chunked(body, 5), meta, raw=True))
+    assert all(isinstance(row, RawJSON) for row in rows)
+    assert [json.loads(row.text)["id"] for row in rows] == ["a", "b"]
+    assert meta == {"queryToken": "t"}
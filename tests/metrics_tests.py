@@ -0,0 +1,99 @@
+import json
+import logging
+import socket
+
+import mock
+import requests
+
+import boompy
+
+from boompy.base_api import API
+from boompy.metrics import MemorySink, PrometheusSink, LoggingSink, StatsDSink, request_tags
+from boompy.rate_limit import RateLimiter
+
+from helpers import make_response
+
+def test_request_tags():
+    assert request_tags("https://api.boomi.com/api/rest/v1/acct/Atom/query", "post") == \
+        {"resource": "Atom", "method": "query"}
+    assert request_tags("https://api.boomi.com/partner/api/rest/v1/acct/Atom/a1?overrideAccount=c",
+                        "get") == {"resource": "Atom", "method": "get"}
+    assert request_tags("https://api.boomi.com/api/rest/v1/acct/Process/bulk", "post") == \
+        {"resource": "Process", "method": "bulk"}
+
+@mock.patch.object(requests.Session, "post")
+def test_query_metrics(post_patch):
+    body = json.dumps({"numberOfResults": 2, "result": [{"id": "a1"}, {"id": "a2"}]})
+    post_patch.return_value = make_response(200, content=body)
+    boompy.set_auth("account_id", "username", "password")
+    sink = MemorySink()
+    boompy.enable_metrics(sink)
+
+    try:
+        assert len(list(boompy.Atom.query(status="ONLINE"))) == 2
+    finally:
+        boompy.disable_metrics()
+
+    latency = sink.histogram("request.latency", resource="Atom", method="query")
+    assert latency.count == 1
+    assert sink.counter("page.bytes", resource="Atom") == len(body)
+    assert sink.counter("request.bytes_out", resource="Atom") == len(post_patch.call_args[1]["data"])
+    assert sink.counter("request.responses", status=200) == 1
+    assert sink.counter("page.rows", resource="Atom") == 2
+    assert sink.histogram("page.decode", resource="Atom").count == 1
+    assert sink.histogram("page.materialize", resource="Atom").count == 1
+
+@mock.patch("boompy.rate_limit.time.sleep")
+@mock.patch.object(requests.Session, "get")
+def test_retry_metrics(get_patch, sleep_patch):
+    get_patch.side_effect = [make_response(429, content="", headers={"Retry-After": "2"}),
+                             make_response(200, {"id": "a1"})]
+    boompy.set_auth("account_id", "username", "password")
+    API().rate_limiter = RateLimiter()
+    sink = MemorySink()
+    boompy.enable_metrics(sink)
+
+    try:
+        assert boompy.Atom.get("a1").id == "a1"
+    finally:
+        boompy.disable_metrics()
+
+    assert sink.counter("request.rate_limited", resource="Atom", method="get") == 1
+    assert sink.counter("request.retries", resource="Atom", method="get") == 1
+    assert sink.histogram("request.backoff", resource="Atom", method="get").sum == 2.0
+    assert sink.counter("request.responses", resource="Atom", status=200) == 1
+    assert sink.counter("request.bytes_in", resource="Atom") == len(json.dumps({"id": "a1"}))
+
+def test_prometheus_render():
+    sink = PrometheusSink()
+    sink.timing("request.latency", 0.2, {"resource": "Atom", "method": "get"})
+    sink.timing("request.latency", 3, {"resource": "Atom", "method": "get"})
+    sink.count("request.retries", 2, {"resource": "Atom"})
+
+    text = sink.render()
+    assert "# TYPE boompy_request_latency_seconds histogram" in text
+    assert 'boompy_request_latency_seconds_bucket{method="get",resource="Atom",le="0.25"} 1' in text
+    assert 'boompy_request_latency_seconds_bucket{method="get",resource="Atom",le="+Inf"} 2' in text
+    assert 'boompy_request_latency_seconds_count{method="get",resource="Atom"} 2' in text
+    assert "# TYPE boompy_request_retries_total counter" in text
+    assert 'boompy_request_retries_total{resource="Atom"} 2' in text
+
+def test_logging_sink():
+    logger = mock.Mock(spec=logging.Logger)
+    sink = LoggingSink(logger, level=logging.INFO)
+    sink.count("request.retries", 1, {"resource": "Atom"})
+    assert logger.log.call_args[0][0] == logging.INFO
+    assert logger.log.call_args[0][2] == "request.retries"
+
+def test_statsd_sink():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(("127.0.0.1", 0))
+    server.settimeout(5)
+    try:
+        sink = StatsDSink(port=server.getsockname()[1])
+        sink.timing("request.latency", 0.25, {"resource": "Atom", "method": "get"})
+        assert server.recv(1024) == "boompy.request.latency:250.000|ms|#method:get,resource:Atom"
+        sink.count("request.retries", 1, {})
+        assert server.recv(1024) == "boompy.request.retries:1|c"
+    finally:
+        server.close()
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+
+from datetime import datetime
+
+import mock
+import requests
+
+import boompy
+
+from boompy.errors import InterfaceError
+from boompy.mirror import Mirror
+
+from helpers import make_query_response
+
+ATOMS = [
+    {"@type": "Atom", "id": "a1", "name": "prod", "status": "ONLINE",
+     "dateInstalled": "2016-01-01T00:00:00Z"},
+    {"@type": "Atom", "id": "a2", "name": "test", "status": "OFFLINE",
+     "dateInstalled": "2016-02-01T00:00:00Z"},
+    {"@type": "Atom", "id": "a3", "name": "prod-2", "status": "ONLINE",
+     "dateInstalled": "2016-03-01T00:00:00Z"},
+]
+
+def names(entities):
+    return sorted(e.name for e in entities)
+
+@mock.patch.object(requests.Session, "post")
+def test_mirror_query(post_patch):
+    boompy.set_auth("account_id", "username", "password")
+    post_patch.return_value = make_query_response(ATOMS)
+
+    mirror = Mirror()
+    assert mirror.sync(boompy.Atom) == 3
+    assert post_patch.call_count == 1
+
+    assert names(mirror.query(boompy.Atom)) == ["prod", "prod-2", "test"]
+    assert names(mirror.query(boompy.Atom, status="ONLINE")) == ["prod", "prod-2"]
+    assert names(mirror.query(boompy.Atom, name__starts_with="prod")) == ["prod", "prod-2"]
+    assert names(mirror.query(boompy.Atom, name__like="%-2")) == ["prod-2"]
+    assert names(mirror.query(boompy.Atom, dateInstalled__gte=datetime(2016, 2, 1))) == \
+        ["prod-2", "test"]
+    assert names(mirror.query(boompy.Atom, join="or", status="OFFLINE", name="prod")) == \
+        ["prod", "test"]
+    assert names(mirror.query(boompy.Atom, cloudId__null=True)) == ["prod", "prod-2", "test"]
+
+    atom = mirror.get(boompy.Atom, "a2")
+    assert isinstance(atom, boompy.Atom)
+    assert atom.name == "test" and atom.status == "OFFLINE"
+    assert mirror.get(boompy.Atom, "missing") is None
+
+    # Nothing was read from boomi after the sync.
+    assert post_patch.call_count == 1
+
+@mock.patch.object(requests.Session, "post")
+def test_mirror_is_scoped_to_account(post_patch):
+    boompy.set_auth("account_id", "username", "password")
+    post_patch.return_value = make_query_response(ATOMS)
+    mirror = Mirror()
+    mirror.sync(boompy.Atom)
+
+    boompy.set_auth("other_account", "username", "password")
+    assert mirror.query(boompy.Atom) == []
+
+    # Syncing again replaces the rows instead of adding to them.
+    post_patch.return_value = make_query_response(ATOMS[:1])
+    assert mirror.sync(boompy.Atom) == 1
+    assert names(mirror.query(boompy.Atom)) == ["prod"]
+
+    boompy.set_auth("account_id", "username", "password")
+    assert len(mirror.query(boompy.Atom)) == 3
+
+def test_mirror_unknown_attribute():
+    boompy.set_auth("account_id", "username", "password")
+    mirror = Mirror()
+    assert mirror.query(boompy.Atom, name="prod") == []
+
+    with mock.patch.object(requests.Session, "post") as post_patch:
+        post_patch.return_value = make_query_response(ATOMS)
+        mirror.sync(boompy.Atom)
+
+    try:
+        mirror.query(boompy.Atom, bogus="x")
+        assert False, "expected an InterfaceError"
+    except InterfaceError:
+        pass
+
+def test_mirror_indexes_references():
+    boompy.set_auth("account_id", "username", "password")
+    mirror = Mirror()
+    with mock.patch.object(requests.Session, "post") as post_patch:
+        post_patch.return_value = make_query_response([{"id": "d1", "environmentId": "e1",
+                                                        "processId": "p1"}])
+        mirror.sync(boompy.Deployment)
+
+    indexes = set(row[1] for row in mirror.conn.execute("PRAGMA index_list(Deployment)"))
+    assert "Deployment_environmentId" in indexes
+    assert "Deployment_processId" in indexes
+    assert [d.id for d in mirror.query(boompy.Deployment, processId="p1")] == ["d1"]
+
+@mock.patch.object(requests.Session, "post")
+def test_mirror_reopened(post_patch):
+    boompy.set_auth("account_id", "username", "password")
+    post_patch.return_value = make_query_response(ATOMS)
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "mirror.db")
+        Mirror(path).sync(boompy.Atom)
+
+        mirror = Mirror(path)
+        assert names(mirror.query(boompy.Atom, status="ONLINE")) == ["prod", "prod-2"]
+        assert mirror.get(boompy.Atom, "a2").name == "test"
+        assert post_patch.call_count == 1
+    finally:
+        shutil.rmtree(directory)
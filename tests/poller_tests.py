@@ -0,0 +1,83 @@
+import threading
+
+from multiprocessing import TimeoutError
+
+from nose.tools import raises
+
+from boompy.errors import BoomiError
+from boompy.poller import CancelledError, Future, Poller
+
+def countdown_job(polls, result):
+    """ A poll/check pair whose job finishes after `polls` polls. """
+    state = {"polls": 0, "threads": set()}
+
+    def poll():
+        state["polls"] += 1
+        state["threads"].add(threading.current_thread().ident)
+        return state["polls"]
+
+    def check(future, count):
+        if count >= polls:
+            future.set_result(result)
+
+    return poll, check, state
+
+def test_future():
+    future = Future()
+    called = []
+    future.add_done_callback(called.append)
+    assert not future.ready()
+    assert future.set_result(1)
+    assert not future.set_result(2)
+    assert future.get() == 1
+    assert future.successful()
+    assert called == [future]
+
+@raises(TimeoutError)
+def test_future_get_timeout():
+    Future().get(timeout=.01)
+
+def test_future_get_waits_in_short_steps():
+    future = Future()
+    done = future._Future__done
+    timeouts = []
+
+    def wait(timeout=None):
+        timeouts.append(timeout)
+        return threading._Event.wait(done, timeout)
+
+    done.wait = wait
+    threading.Timer(.05, future.set_result, [1]).start()
+    assert future.get() == 1
+    assert None not in timeouts
+
+def test_poller_multiplexes_jobs_on_one_thread():
+    jobs = [countdown_job(3, i) for i in range(20)]
+    futures = [Poller().watch(poll, check, interval=.01, max_interval=.02)
+               for poll, check, _ in jobs]
+
+    assert [future.get(timeout=5) for future in futures] == range(20)
+    threads = set()
+    for _, _, state in jobs:
+        assert state["polls"] == 3
+        threads.update(state["threads"])
+    assert len(threads) == 1
+
+@raises(BoomiError)
+def test_poller_timeout():
+    poll, check, _ = countdown_job(1000, None)
+    Poller().watch(poll, check, interval=.01, timeout=.05).get(timeout=5)
+
+@raises(CancelledError)
+def test_poller_cancel():
+    poll, check, state = countdown_job(1000, None)
+    future = Poller().watch(poll, check, interval=.01)
+    assert future.cancel()
+    future.get(timeout=5)
+
+@raises(ValueError)
+def test_poller_poll_errors():
+    def poll():
+        raise ValueError("boom")
+
+    Poller().watch(poll, lambda future, value: None, interval=.01).get(timeout=5)
@@ -0,0 +1,101 @@
+import json
+
+import mock
+import requests
+
+from nose.tools import raises
+
+import boompy
+
+from boompy import Q
+from boompy.errors import InterfaceError
+from boompy.query import normalize, split
+
+from helpers import make_query_response
+
+def test_q_compiles_nested_expressions():
+    q = Q(status="ERROR") | (Q(eventLevel="WARNING") & Q(atomId__not="a1"))
+    assert q.expression() == {"operator": "or", "nestedExpression": [
+        {"argument": ["ERROR"], "operator": "EQUALS", "property": "status"},
+        {"operator": "and", "nestedExpression": [
+            {"argument": ["WARNING"], "operator": "EQUALS", "property": "eventLevel"},
+            {"argument": ["a1"], "operator": "NOT_EQUALS", "property": "atomId"},
+        ]},
+    ]}
+
+def test_negation_is_pushed_down():
+    q = ~(Q(status="ERROR") & Q(errorDocumentCount__gt=5))
+    assert q.expression() == {"operator": "or", "nestedExpression": [
+        {"argument": ["ERROR"], "operator": "NOT_EQUALS", "property": "status"},
+        {"argument": [5], "operator": "LESS_THAN_OR_EQUAL", "property": "errorDocumentCount"},
+    ]}
+
+    assert (~Q(atomId=["a1", "a2"])).expression() == {"operator": "and", "nestedExpression": [
+        {"argument": ["a1"], "operator": "NOT_EQUALS", "property": "atomId"},
+        {"argument": ["a2"], "operator": "NOT_EQUALS", "property": "atomId"},
+    ]}
+    assert (~~Q(status="ERROR")).expression() == Q(status="ERROR").expression()
+
+@raises(InterfaceError)
+def test_negating_like_fails():
+    (~Q(name__like="%prod%")).expression()
+
+def test_normalize_flattens_merges_and_dedups():
+    q = (Q(atomId="a1") | Q(atomId=["a2", "a1"])) | (Q(status="ERROR") | Q(status="ERROR"))
+    assert q.expression() == {"operator": "or", "nestedExpression": [
+        {"argument": ["a1", "a2"], "operator": "EQUALS", "property": "atomId"},
+        {"argument": ["ERROR"], "operator": "EQUALS", "property": "status"},
+    ]}
+
+    duplicate = {"argument": ["x"], "operator": "EQUALS", "property": "name"}
+    assert normalize({"operator": "and", "nestedExpression": [duplicate, dict(duplicate)]}) == \
+        duplicate
+
+def test_split_long_lists():
+    ids = ["a%s" % i for i in range(450)]
+    expression = (Q(atomId=ids) & Q(status="ERROR")).expression()
+    pieces = split(expression, limit=200)
+    assert len(pieces) == 3
+    assert [len(p["nestedExpression"][0]["argument"]) for p in pieces] == [200, 200, 50]
+    assert all(p["nestedExpression"][1] == expression["nestedExpression"][1] for p in pieces)
+    assert split(Q(status="ERROR").expression()) == [Q(status="ERROR").expression()]
+
+def test_query_accepts_q():
+    assert boompy.Event._query_filter(Q(status="ERROR") | Q(status="WARN"), atomId="a1") == \
+        {"QueryFilter": {"expression": {"operator": "and", "nestedExpression": [
+            {"argument": ["ERROR", "WARN"], "operator": "EQUALS", "property": "status"},
+            {"argument": ["a1"], "operator": "EQUALS", "property": "atomId"},
+        ]}}}
+
+@mock.patch.object(requests.Session, "post")
+def test_query_splits_and_dedups(post_patch):
+    def respond(url, data=None, **kwargs):
+        expression = json.loads(data)["QueryFilter"]["expression"]
+        ids = [e for e in expression["nestedExpression"] if e["property"] == "id"][0]["argument"]
+        # env0 matches the "or" on name in every sub query.
+        return make_query_response([{"id": i, "name": i} for i in ["env0"] + ids])
+
+    post_patch.side_effect = respond
+    boompy.set_auth("account_id", "username", "password")
+
+    ids = ["env%s" % i for i in range(1, boompy.IN_LIST_LIMIT * 2 + 2)]
+    results = boompy.Environment.query(Q(id=ids) | Q(name="env0"))
+    assert post_patch.call_count == 3
+    assert sorted(env.id for env in results) == sorted(["env0"] + ids)
+    assert len(results) == len(ids) + 1
+
+@mock.patch.object(requests.Session, "post")
+def test_split_query_async(post_patch):
+    post_patch.side_effect = lambda url, data=None, **kwargs: make_query_response([
+        {"id": atom_id, "atomId": atom_id}
+        for atom_id in json.loads(data)["QueryFilter"]["expression"]["argument"]])
+    boompy.set_auth("account_id", "username", "password")
+    # With one worker, sub queries queued on the pool would never run.
+    boompy.set_concurrency(1)
+
+    try:
+        ids = ["a%s" % i for i in range(450)]
+        assert len(boompy.ProcessAtomAttachment.query_async(atomId=ids).get(timeout=5)) == 450
+        assert post_patch.call_count == 3
+    finally:
+        boompy.set_concurrency(boompy.base_api.DEFAULT_POOL_SIZE)
@@ -0,0 +1,73 @@
+import mock
+import requests
+
+from nose.tools import raises
+
+from boompy.base_api import API
+from boompy.errors import RateLimitError
+from boompy.rate_limit import RateLimiter, RetryPolicy, TokenBucket, retry_after_seconds
+
+from helpers import make_response
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(make_response(429, headers={"Retry-After": "3"})) == 3.0
+    assert retry_after_seconds(make_response(429, headers={"Retry-After": "garbage"})) is None
+    assert retry_after_seconds(make_response(429)) is None
+    assert retry_after_seconds(mock.Mock(spec=requests.Response)) is None
+
+def test_token_bucket_aimd():
+    bucket = TokenBucket(rate=10, increase=0)
+    bucket.throttle()
+    assert bucket.rate == 5
+    bucket.throttle()
+    assert bucket.rate == 2.5
+
+def test_token_bucket_retry_after_blocks():
+    bucket = TokenBucket(rate=10)
+    bucket.throttle(retry_after=.1)
+    assert bucket.acquire() > 0
+
+def test_per_account_limits():
+    limiter = RateLimiter(rate=10, accounts={"partner": (2, 1)})
+    assert limiter.bucket(("account_id", None)).max_rate == 10
+    assert limiter.bucket(("account_id", "partner")).max_rate == 2
+
+def test_retry_policy_idempotent():
+    retry = RetryPolicy()
+    assert retry.is_retryable("get", "https://boomi/Atom/1")
+    assert retry.is_retryable("post", "https://boomi/Atom/query")
+    assert retry.is_retryable("post", "https://boomi/Atom/queryMore?overrideAccount=abc")
+    assert not retry.is_retryable("post", "https://boomi/Atom")
+
+@mock.patch("boompy.rate_limit.time.sleep")
+@mock.patch.object(requests.Session, "get")
+def test_https_request_retries_rate_limited(get_patch, sleep_patch):
+    get_patch.side_effect = [make_response(429, {"message": "testing"}, {"Retry-After": "2"}),
+                             make_response(200, {"message": "testing"})]
+    api = API()
+    api._set_auth("account_id", "username", "password")
+    api.rate_limiter = RateLimiter()
+
+    res = api.https_request("a real url", "get", {})
+    assert res.status_code == 200
+    assert get_patch.call_count == 2
+    sleep_patch.assert_any_call(2.0)
+
+    stats = api.rate_limiter.stats()
+    assert stats["rate_limited"] == 1
+    assert stats["retries"] == 1
+    assert stats["backoff_seconds"] == 2.0
+
+@raises(RateLimitError)
+@mock.patch("boompy.rate_limit.time.sleep")
+@mock.patch.object(requests.Session, "post")
+def test_https_request_does_not_retry_writes(post_patch, sleep_patch):
+    post_patch.return_value = make_response(503, {"message": "testing"})
+    api = API()
+    api._set_auth("account_id", "username", "password")
+    api.rate_limiter = RateLimiter()
+
+    try:
+        api.https_request("a real url", "post", {})
+    finally:
+        assert post_patch.call_count == 1
@@ -0,0 +1,274 @@
+import json
+import time
+
+import mock
+import requests
+
+from nose.tools import raises
+
+import boompy
+
+from boompy.errors import APIRequestError
+
+from helpers import make_response
+
+def make_page(start, count, total, token=True):
+    return make_response(200, {
+        "@type": "QueryResult",
+        "result": [{"@type": "Environment", "id": "env%s" % i, "name": "Env %s" % i,
+                    "classification": "PROD"} for i in range(start, start + count)],
+        "queryToken": "token%s" % start if token else None,
+        "numberOfResults": total,
+    })
+
+def make_pages(total, page_size=100):
+    return [make_page(start, min(page_size, total - start), total,
+                      token=start + page_size < total)
+            for start in range(0, total, page_size)]
+
+@mock.patch.object(requests.Session, "post")
+def test_prefetch_returns_every_row(post_patch):
+    post_patch.side_effect = make_pages(305)
+    boompy.set_auth("account_id", "username", "password")
+
+    results = boompy.Environment.query(classification="PROD")
+    ids = [env.id for env in results.prefetch(depth=2)]
+    assert ids == ["env%s" % i for i in range(305)]
+    assert post_patch.call_count == 4
+
+@mock.patch.object(requests.Session, "post")
+def test_prefetch_backpressure(post_patch):
+    post_patch.side_effect = make_pages(1000)
+    boompy.set_auth("account_id", "username", "password")
+
+    results = boompy.Environment.query()
+    rows = results.prefetch(depth=1)
+    next(rows)
+    time.sleep(.3)
+
+    # The first query, one buffered page and one page waiting to be buffered.
+    assert post_patch.call_count <= 3
+    rows.close()
+
+@mock.patch.object(requests.Session, "post")
+def test_prefetch_max_rows_bounds_depth(post_patch):
+    post_patch.side_effect = make_pages(1000)
+    boompy.set_auth("account_id", "username", "password")
+
+    results = boompy.Environment.query()
+    rows = results.prefetch(depth=8, max_rows=100)
+    next(rows)
+    time.sleep(.3)
+    assert post_patch.call_count <= 3
+    rows.close()
+
+@mock.patch.object(requests.Session, "post")
+def test_prefetch_buffers_at_least_one_page(post_patch):
+    post_patch.side_effect = make_pages(1000)
+    boompy.set_auth("account_id", "username", "password")
+
+    rows = boompy.Environment.query().prefetch(depth=8, max_rows=10)
+    next(rows)
+    time.sleep(.3)
+    # The first page, one buffered page and one the fetcher holds while the buffer is full.
+    assert 2 <= post_patch.call_count <= 3
+    rows.close()
+
+@raises(APIRequestError)
+@mock.patch.object(requests.Session, "post")
+def test_prefetch_raises_fetch_errors(post_patch):
+    post_patch.side_effect = [make_page(0, 100, 200), make_response(500, {"message": "boom"})]
+    boompy.set_auth("account_id", "username", "password")
+
+    list(boompy.Environment.query().prefetch())
+
+def make_streamed_response(body, chunk_size):
+    """ A real, unread requests.Response which hands its body out `chunk_size` bytes at a time. """
+    res = requests.Response()
+    res.status_code = 200
+    res.raw = mock.Mock()
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    res.raw.stream.return_value = iter(chunks)
+    return res
+
+def test_page_for_streamed_response():
+    rows = [{"@type": "Event", "eventId": "event%s" % i, "title": u"caf\xe9 %s" % i,
+             "errorDocumentCount": i * 1000} for i in range(50)]
+    body = json.dumps({"@type": "QueryResult", "result": rows, "queryToken": "abc",
+                       "numberOfResults": 50}, ensure_ascii=False).encode("utf-8")
+
+    for chunk_size in (1, 7, 4096):
+        response = make_streamed_response(body, chunk_size)
+        page = boompy.resource.ResourceList.page_for_response(boompy.Event, response)
+        assert len(page) == 50
+        assert page.query_token == "abc"
+        assert [e.title for e in page] == [u"caf\xe9 %s" % i for i in range(50)]
+        assert [e.errorDocumentCount for e in page] == [i * 1000 for i in range(50)]
+
+def test_iter_response_yields_before_body_is_read():
+    body = '{"result": %s, "numberOfResults": 10}' % json.dumps([{"id": "env%s" % i}
+                                                                 for i in range(10)])
+    response = make_streamed_response(body, 16)
+    meta = {}
+    entities = boompy.resource.ResourceList.iter_response(boompy.Environment, response, meta)
+    assert next(entities).id == "env0"
+    assert "numberOfResults" not in meta
+    assert len(list(entities)) == 9
+    assert meta["numberOfResults"] == 10
+
+@mock.patch.object(requests.Session, "post")
+def test_query_records(post_patch):
+    post_patch.side_effect = make_pages(150)
+    boompy.set_auth("account_id", "username", "password")
+
+    rows = list(boompy.Environment.query(records=True))
+    assert len(rows) == 150
+    assert all(isinstance(row, boompy.Environment.Record) for row in rows)
+    assert rows[149].id == "env149"
+    assert rows[0].classification == "PROD"
+
+def make_event_pages(total, page_size=100):
+    pages = []
+    for start in range(0, total, page_size):
+        pages.append(make_response(200, {
+            "result": [{"eventId": "event%s" % i, "status": "ERROR" if i % 3 else "COMPLETE",
+                        "errorDocumentCount": i, "eventDate": "2016-01-01T00:00:%02dZ" % (i % 60),
+                        "inboundDocumentCount": None if i == 5 else i}
+                       for i in range(start, min(start + page_size, total))],
+            "queryToken": "token%s" % start if start + page_size < total else None,
+            "numberOfResults": total,
+        }))
+    return pages
+
+@mock.patch.object(requests.Session, "post")
+def test_to_columns(post_patch):
+    post_patch.side_effect = make_event_pages(250)
+    boompy.set_auth("account_id", "username", "password")
+
+    columns = boompy.Event.query().to_columns()
+    assert set(columns) == set(boompy.Event._attributes)
+    assert columns["eventId"] == ["event%s" % i for i in range(250)]
+    assert columns["errorDocumentCount"][249] == 249
+    assert columns["atomId"] == [None] * 250
+    assert post_patch.call_count == 3
+
+@mock.patch.object(requests.Session, "post")
+def test_to_arrays(post_patch):
+    from nose.plugins.skip import SkipTest
+    if boompy.columns.numpy is None:
+        raise SkipTest("numpy is not installed")
+    import numpy
+
+    post_patch.side_effect = make_event_pages(250)
+    boompy.set_auth("account_id", "username", "password")
+
+    arrays = boompy.Event.query().to_arrays()
+    assert arrays["errorDocumentCount"].dtype == numpy.int64
+    assert arrays["errorDocumentCount"].sum() == sum(range(250))
+    assert arrays["inboundDocumentCount"].dtype == numpy.float64
+    assert numpy.isnan(arrays["inboundDocumentCount"][5])
+    assert arrays["eventDate"].dtype == numpy.dtype("datetime64[s]")
+    assert str(arrays["eventDate"][61]) == "2016-01-01T00:00:01"
+    assert sorted(arrays["status"].categories) == ["COMPLETE", "ERROR"]
+    assert arrays["status"][0] == "COMPLETE"
+    assert arrays["status"][1] == "ERROR"
+    assert (arrays["atomId"].codes == -1).all()
+
+def serve_pages(total, page_size=100):
+    """ side_effect answering query and queryMore from the pages make_pages builds. """
+    pages = make_pages(total, page_size)
+
+    def respond(url, data=None, **kwargs):
+        if url.endswith("/query"):
+            return pages[0]
+        return pages[int(data[len("token"):]) // page_size + 1]
+    return respond
+
+@mock.patch.object(requests.Session, "post")
+def test_iter_query_streams(post_patch):
+    post_patch.side_effect = serve_pages(250)
+    boompy.set_auth("account_id", "username", "password")
+
+    cursor = boompy.Environment.iter_query(classification="PROD")
+    rows = iter(cursor)
+    assert next(rows).id == "env0"
+    assert post_patch.call_count == 1
+
+    assert [env.id for env in rows] == ["env%s" % i for i in range(1, 250)]
+    assert post_patch.call_count == 3
+    assert cursor.total == 250
+
+@mock.patch.object(requests.Session, "post")
+def test_iter_query_resumes(post_patch):
+    post_patch.side_effect = serve_pages(250)
+    boompy.set_auth("account_id", "username", "password")
+
+    cursor = boompy.Environment.iter_query()
+    rows = iter(cursor)
+    for _ in range(130):
+        next(rows)
+    rows.close()
+    assert (cursor.query_token, cursor.page_offset) == ("token0", 30)
+
+    resumed = boompy.Environment.iter_query(query_token=cursor.query_token,
+                                            page_offset=cursor.page_offset)
+    assert [env.id for env in resumed] == ["env%s" % i for i in range(130, 250)]
+
+@mock.patch.object(requests.Session, "post")
+def test_iter_query_index_and_slice(post_patch):
+    post_patch.side_effect = serve_pages(250)
+    boompy.set_auth("account_id", "username", "password")
+    cursor = boompy.Environment.iter_query(records=True)
+
+    assert cursor[5].id == "env5"
+    assert post_patch.call_count == 1
+
+    assert [env.id for env in cursor[98:103]] == ["env98", "env99", "env100", "env101", "env102"]
+    assert post_patch.call_count == 3
+
+    assert [env.id for env in cursor[240::4]] == ["env240", "env244", "env248"]
+    assert [env.id for env in cursor[245:1000]] == ["env%s" % i for i in range(245, 250)]
+
+@raises(IndexError)
+@mock.patch.object(requests.Session, "post")
+def test_iter_query_index_out_of_range(post_patch):
+    post_patch.side_effect = serve_pages(50)
+    boompy.set_auth("account_id", "username", "password")
+    boompy.Environment.iter_query()[50]
+
+@mock.patch.object(requests.Session, "post")
+def test_query_fields(post_patch):
+    post_patch.side_effect = make_event_pages(150)
+    boompy.set_auth("account_id", "username", "password")
+
+    events = list(boompy.Event.query(fields=("eventId", "status")))
+    assert len(events) == 150
+    assert events[149].eventId == "event149"
+    assert events[149].status == "ERROR"
+    assert events[149].eventDate is None
+    assert events[149].errorDocumentCount is None
+
+@mock.patch.object(requests.Session, "post")
+def test_query_records_fields(post_patch):
+    post_patch.side_effect = make_event_pages(150)
+    boompy.set_auth("account_id", "username", "password")
+
+    rows = list(boompy.Event.query(records=True, fields=("eventId", "eventDate")))
+    assert rows[61].eventId == "event61"
+    assert rows[61].eventDate.second == 1
+    assert rows[61].status is None
+
+    post_patch.side_effect = make_event_pages(150)
+    columns = boompy.Event.query(fields=("eventId",)).to_columns()
+    assert columns["eventId"][149] == "event149"
+    assert columns["status"] == [None] * 150
+
+@mock.patch.object(requests.Session, "post")
+def test_iter_query_fields(post_patch):
+    post_patch.side_effect = serve_pages(250)
+    boompy.set_auth("account_id", "username", "password")
+    cursor = boompy.Environment.iter_query(fields=("id",))
+
+    assert cursor[120].id == "env120"
+    assert cursor[120].name is None
+    assert [env.name for env in cursor] == [None] * 250
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import mock
+import requests
+
+from nose.tools import raises
+
+import boompy
+
+from boompy.errors import NotFoundError
+from boompy.single_flight import SingleFlight, is_read
+
+from helpers import make_response
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(.001)
+
+def run_threads(count, fn):
+    """ Runs fn in `count` threads and returns what each returned or raised. """
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = fn()
+        except Exception, e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_is_read():
+    assert is_read("https://api.boomi.com/api/rest/v1/acct/Atom/a1", "get")
+    assert is_read("https://api.boomi.com/api/rest/v1/acct/Atom/query?overrideAccount=c", "post")
+    assert is_read("https://api.boomi.com/api/rest/v1/acct/Atom/queryMore", "post")
+    assert not is_read("https://api.boomi.com/api/rest/v1/acct/Atom/a1/update", "post")
+    assert not is_read("https://api.boomi.com/api/rest/v1/acct/Atom/a1", "delete")
+
+def test_concurrent_calls_share_one():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait()
+        return "result"
+
+    threads, results = run_threads(5, lambda: single_flight.do("key", fn))
+    wait_for(lambda: single_flight.stats()["shared"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(results) == [("result", False)] + [("result", True)] * 4
+    assert single_flight.stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+    # Once a call is done, the next caller starts a new one.
+    assert single_flight.do("key", lambda: "again") == ("again", False)
+
+@mock.patch.object(requests.Session, "get")
+def test_concurrent_gets_are_coalesced(get_patch):
+    release = threading.Event()
+
+    def get(url, **kwargs):
+        release.wait()
+        return make_response(200, {"id": "env1", "name": "Prod"})
+
+    get_patch.side_effect = get
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_single_flight()
+    try:
+        threads, results = run_threads(4, lambda: boompy.Environment.get("env1"))
+        wait_for(lambda: boompy.single_flight_stats()["shared"] == 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert get_patch.call_count == 1
+        assert [env.name for env in results] == ["Prod"] * 4
+        # Each caller decodes its own entity.
+        assert len(set(id(env) for env in results)) == 4
+    finally:
+        boompy.disable_single_flight()
+
+@mock.patch.object(requests.Session, "get")
+def test_errors_are_shared(get_patch):
+    release = threading.Event()
+
+    def get(url, **kwargs):
+        release.wait()
+        return make_response(404, {"message": "not found"})
+
+    get_patch.side_effect = get
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_single_flight()
+    try:
+        threads, results = run_threads(3, lambda: boompy.Environment.get("missing"))
+        wait_for(lambda: boompy.single_flight_stats()["shared"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert get_patch.call_count == 1
+        assert all(isinstance(result, NotFoundError) for result in results)
+    finally:
+        boompy.disable_single_flight()
+
+@mock.patch.object(requests.Session, "post")
+def test_different_keys_are_not_shared(post_patch):
+    post_patch.return_value = make_response(200, {"result": [], "numberOfResults": 0})
+    boompy.set_auth("account_id", "username", "password")
+    boompy.enable_single_flight()
+    try:
+        boompy.Environment.query(classification="PROD")
+        with boompy.sub_account("customer"):
+            boompy.Environment.query(classification="PROD")
+        boompy.Environment.query(classification="TEST")
+        assert post_patch.call_count == 3
+        assert boompy.single_flight_stats()["shared"] == 0
+    finally:
+        boompy.disable_single_flight()
+
+@raises(ValueError)
+def test_leader_errors_are_raised():
+    SingleFlight().do("key", lambda: int("nope"))
@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import tempfile
+
+from datetime import datetime, timedelta
+
+import mock
+import requests
+
+import boompy
+
+from boompy.sync import CheckpointStore, event_sync
+
+from helpers import make_query_response
+
+def event(event_id, minute):
+    return {"eventId": event_id, "eventDate": "2016-03-01T10:%02d:00Z" % minute}
+
+def query_filter(call):
+    return json.loads(call[1]["data"]).get("QueryFilter")
+
+@mock.patch.object(requests.Session, "post")
+def test_sync_dedups_across_overlap(post_patch):
+    boompy.set_auth("account_id", "username", "password")
+    sync = event_sync(CheckpointStore(), overlap=timedelta(minutes=5))
+
+    post_patch.return_value = make_query_response([event("e1", 0), event("e2", 10)])
+    assert [e.eventId for e in sync.poll()] == ["e1", "e2"]
+    assert query_filter(post_patch.call_args) is None
+
+    # e2 is inside the overlap window so it comes back again, along with a late arrival.
+    post_patch.return_value = make_query_response([event("e2", 10), event("late", 8), event("e3", 12)])
+    assert [e.eventId for e in sync.poll()] == ["late", "e3"]
+    expression = query_filter(post_patch.call_args)["expression"]
+    assert expression == {"operator": "GREATER_THAN_OR_EQUAL", "property": "eventDate",
+                          "argument": ["2016-03-01T10:05:00Z"]}
+
+@mock.patch.object(requests.Session, "post")
+def test_sync_resumes_from_checkpoint(post_patch):
+    boompy.set_auth("account_id", "username", "password")
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "checkpoints.db")
+        post_patch.return_value = make_query_response([event("e1", 0), event("e2", 10)])
+        assert len(list(event_sync(CheckpointStore(path)).poll())) == 2
+
+        # A consumer which dies part way through doesn't move the checkpoint.
+        post_patch.return_value = make_query_response([event("e2", 10), event("e3", 20),
+                                                       event("e4", 21)])
+        rows = event_sync(CheckpointStore(path)).poll()
+        assert next(rows).eventId == "e3"
+        rows.close()
+
+        sync = event_sync(CheckpointStore(path))
+        assert sync.store.watermark(sync.key()) == datetime(2016, 3, 1, 10, 10)
+        assert [e.eventId for e in sync.poll()] == ["e3", "e4"]
+        assert sync.store.watermark(sync.key()) == datetime(2016, 3, 1, 10, 21)
+    finally:
+        shutil.rmtree(directory)
+
+@mock.patch.object(requests.Session, "post")
+def test_sync_checkpoints_per_account(post_patch):
+    boompy.set_auth("account_id", "username", "password")
+    sync = event_sync(CheckpointStore())
+
+    post_patch.return_value = make_query_response([event("e1", 0)])
+    assert len(list(sync.poll())) == 1
+    with boompy.sub_account("customer"):
+        assert len(list(sync.poll())) == 1
+        assert query_filter(post_patch.call_args) is None
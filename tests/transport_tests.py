@@ -0,0 +1,96 @@
+import gzip
+import json
+import socket
+import threading
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from StringIO import StringIO
+
+import mock
+import requests
+
+from requests.adapters import HTTPAdapter
+
+import boompy
+
+from boompy.base_api import API
+from boompy.transport import (
+    BoomiAdapter,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT
+)
+
+class GzipHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        buf = StringIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+            f.write(json.dumps({"accept_encoding": self.headers.get("Accept-Encoding")}))
+        body = buf.getvalue()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def test_configure_http():
+    boompy.set_auth("account_id", "username", "password")
+    try:
+        boompy.configure_http(pool_connections=3, pool_size=7, connect_timeout=2, read_timeout=30,
+                              compress=False)
+        adapter = API().session.get_adapter("https://api.boomi.com")
+        assert isinstance(adapter, BoomiAdapter)
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 7
+        assert adapter.timeout == (2, 30)
+        assert API().session.headers["Accept-Encoding"] == "identity"
+
+        options = adapter.poolmanager.connection_pool_kw["socket_options"]
+        assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+    finally:
+        boompy.configure_http(pool_connections=10, pool_size=10, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                              read_timeout=DEFAULT_READ_TIMEOUT, compress=True)
+
+    assert API().session.headers["Accept-Encoding"] == "gzip, deflate"
+
+def test_keepalive_off():
+    adapter = BoomiAdapter(keepalive=False)
+    assert "socket_options" not in adapter.poolmanager.connection_pool_kw
+
+@mock.patch.object(HTTPAdapter, "send")
+def test_default_timeout(send_patch):
+    adapter = BoomiAdapter(connect_timeout=1, read_timeout=5)
+    adapter.send("request", timeout=None)
+    assert send_patch.call_args[1]["timeout"] == (1, 5)
+
+    adapter.send("request", timeout=60)
+    assert send_patch.call_args[1]["timeout"] == 60
+
+def test_connection_reuse_and_gzip():
+    server = HTTPServer(("127.0.0.1", 0), GzipHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    adapter = BoomiAdapter()
+    session = requests.session()
+    session.mount("http://", adapter)
+    try:
+        url = "http://127.0.0.1:%s/" % server.server_port
+
+        for _ in range(3):
+            assert session.get(url).json() == {"accept_encoding": "gzip, deflate"}
+
+        stats = adapter.stats()
+        assert stats == {"pools": 1, "connections": 1, "requests": 3, "reused": 2}
+    finally:
+        # The server handles one connection at a time, so let go of ours before stopping it.
+        session.close()
+        server.shutdown()
+        server.server_close()